@@ -0,0 +1,24 @@
+import statistics
+import time
+
+
+def bench(name, run, setup=None, number=1, repeat=5, **params):
+    """
+    Time `run` and return a result record.  `setup` is called (untimed) before each of `repeat`
+    runs of `number` calls; times are seconds per call.
+    """
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        for _ in range(number):
+            run()
+        times.append((time.perf_counter() - start) / number)
+
+    return {"name": name,
+            "params": params,
+            "number": number,
+            "repeat": repeat,
+            "best": min(times),
+            "mean": statistics.mean(times)}
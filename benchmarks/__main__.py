@@ -0,0 +1,49 @@
+"""
+Benchmarks for Chisel's hot paths.  Run from the repository root:
+
+    python -m benchmarks [--quick] [--output results.json]
+
+Results are written as JSON.
+"""
+from argparse import ArgumentParser
+from datetime import datetime, timezone
+import json
+from pathlib import Path
+import platform
+import sys
+from tempfile import TemporaryDirectory
+
+import numpy as np
+
+from . import core
+
+
+def main():
+    parser = ArgumentParser(prog="python -m benchmarks", description=__doc__.splitlines()[1])
+    parser.add_argument("--quick", action="store_true", help="only run the smallest cases")
+    parser.add_argument("--output", type=Path, help="write results to this file, not stdout")
+    args = parser.parse_args()
+
+    results = []
+    with TemporaryDirectory() as directory:
+        for benchmark in core.BENCHMARKS:
+            for result in benchmark(Path(directory), args.quick):
+                print(f"{result['name']} {result['params']}: {result['best']:.3g}s",
+                      file=sys.stderr)
+                results.append(result)
+
+    report = {"timestamp": datetime.now(timezone.utc).isoformat(),
+              "python": platform.python_version(),
+              "numpy": np.__version__,
+              "platform": platform.platform(),
+              "results": results}
+
+    if args.output is None:
+        json.dump(report, sys.stdout, indent=4)
+    else:
+        with args.output.open("w") as file:
+            json.dump(report, file, indent=4)
+
+
+if __name__ == "__main__":
+    main()
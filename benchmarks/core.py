@@ -0,0 +1,189 @@
+from itertools import cycle
+
+import numpy as np
+
+from chisel.engine import (MODES, ChiselModel, LayeredModel, PebbleSystem, StrataModel,
+                           export_png, open_boulder)
+from chisel.engine.layered import sampled_boulder
+from chisel.engine.project import CODECS
+from chisel.engine.replay import DOWN, FRAME, MOVE, UP, Recorder, replay
+from chisel.engine.model import BOULDER_IMAGE_PATHS, IMAGE_SCALE, X_OFFSET, Y_OFFSET, read_boulder
+
+from . import bench
+
+IMAGE_SIZES = 100, 256, 1024
+RADII = 1, 2, 4, 8
+PEBBLE_COUNTS = 100, 1000, 10000
+LAYERED_PEBBLE_COUNTS = 7000, 30000, 120000  # per layer.
+POKES = 200
+STROKES = 20  # Strokes in the synthetic input log.
+
+
+def synthetic_boulder(size, seed=0):
+    """Returns an opaque square boulder of random colors."""
+    image = np.random.default_rng(seed).integers(0, 256, (size, size, 4), dtype=np.uint8)
+    image[..., -1] = 255
+    return image
+
+
+def bench_poke(directory, quick=False):
+    rng = np.random.default_rng(0)
+    points = rng.uniform((X_OFFSET, Y_OFFSET), (X_OFFSET + IMAGE_SCALE, Y_OFFSET + IMAGE_SCALE),
+                         (POKES, 2))
+
+    for size in IMAGE_SIZES[:1] if quick else IMAGE_SIZES:
+        path = directory / f"poke_{size}.npy"
+        np.save(path, synthetic_boulder(size))
+
+        for mode, Model in (("classic", ChiselModel), ("strata", StrataModel)):
+            for radius in RADII:
+                model = Model(path, radius=radius)
+                pokes = cycle(())
+
+                def setup():
+                    nonlocal pokes
+                    model.load_boulder(path)
+                    pokes = cycle(points)
+
+                def run():
+                    x, y = next(pokes)
+                    model.poke(x, y, .01, .01)
+
+                yield bench("poke", run, setup, number=POKES, mode=mode, size=size, radius=radius)
+
+
+def bench_layered_poke(directory, quick=False):
+    rng = np.random.default_rng(0)
+    points = rng.uniform((X_OFFSET, Y_OFFSET), (X_OFFSET + IMAGE_SCALE, Y_OFFSET + IMAGE_SCALE),
+                         (POKES, 2))
+
+    for count in LAYERED_PEBBLE_COUNTS[:1] if quick else LAYERED_PEBBLE_COUNTS:
+        model = LayeredModel(pebble_count=count)
+        image = sampled_boulder(BOULDER_IMAGE_PATHS[0], count)
+        pokes = cycle(())
+
+        def setup():
+            nonlocal pokes
+            model.set_boulder(image)
+            pokes = cycle(points)
+
+        def run():
+            x, y = next(pokes)
+            model.poke(x, y, .01, .01)
+
+        yield bench("layered_poke", run, setup, number=POKES, pebbles=count)
+
+
+def bench_undo(directory, quick=False):
+    # The same stroke on every size, so undo and redo should cost about the same on each.
+    stroke = [(.3, .3, .7, .6, .02, .01)]
+
+    for size in IMAGE_SIZES[:1] if quick else IMAGE_SIZES:
+        path = directory / f"undo_{size}.npy"
+        np.save(path, synthetic_boulder(size))
+        model = ChiselModel(path)
+
+        def setup():
+            model.load_boulder(path)
+            model.stroke(stroke)
+            model.history.commit()
+
+        def run():
+            model.undo()
+            model.redo()
+
+        setup()
+        result = bench("undo_redo", run, setup, number=20, size=size)
+        result["bytes"] = model.history.nbytes
+        yield result
+
+
+def synthetic_log(path, mode, seed=0):
+    """Record an input log of STROKES random strokes, each a poke followed by a few frames."""
+    rng = np.random.default_rng(seed)
+    recorder = Recorder(path, mode, seed)
+
+    for stroke in range(STROKES):
+        tool = stroke % 3
+        x, y = rng.uniform((X_OFFSET, Y_OFFSET), (X_OFFSET + IMAGE_SCALE, Y_OFFSET + IMAGE_SCALE))
+        recorder.record(DOWN, tool, x, y, .01, .01)
+        for _ in range(5):
+            for dx, dy in rng.uniform(-.01, .01, (3, 2)):
+                recorder.record(MOVE, tool, x, y, x + dx, y + dy, dx, dy)
+                x, y = x + dx, y + dy
+            recorder.record(FRAME, tool)
+        recorder.record(UP, tool)
+    recorder.close()
+
+
+def bench_replay(directory, quick=False):
+    for mode in MODES:
+        path = directory / f"{mode}.chisel-log"
+        synthetic_log(path, mode)
+        yield bench("replay", lambda: replay(path), number=1, mode=mode, strokes=STROKES)
+
+
+def bench_pebble_step(directory, quick=False):
+    rng = np.random.default_rng(0)
+
+    for count in PEBBLE_COUNTS[:2] if quick else PEBBLE_COUNTS:
+        pebbles = PebbleSystem(capacity=count)
+        positions = rng.uniform((0, 10), (1, 11), (count, 2))  # High enough that none land.
+        velocities = rng.uniform(-.01, .01, (count, 2))
+        colors = np.full((count, 4), 255, dtype=np.uint8)
+
+        def setup():
+            pebbles.clear()
+            pebbles.add(positions, velocities, colors)
+
+        yield bench("pebble_step", pebbles.step, setup, number=10, pebbles=count)
+
+
+def bench_load_boulder(directory, quick=False):
+    for path in BOULDER_IMAGE_PATHS:
+        yield bench("load_boulder", lambda: read_boulder(path), number=5, asset=path.name)
+
+    # Decoded boulders are cached, so this is what a reset costs:
+    yield bench("open_boulder", open_boulder, number=20)
+
+
+def bench_save_load(directory, quick=False):
+    for size in IMAGE_SIZES[:1] if quick else IMAGE_SIZES:
+        source = directory / f"source_{size}.npy"
+        np.save(source, synthetic_boulder(size))
+        model = ChiselModel(source)
+        path = directory / f"round_trip_{size}.chisel-project"
+
+        for codec in CODECS:
+            def run():
+                model.save(path, codec)
+                model.load_boulder(path)
+
+            result = bench("save_load", run, number=5, size=size, codec=codec)
+            result["bytes"] = path.stat().st_size
+            yield result
+
+
+def bench_export_png(directory, quick=False):
+    path = directory / "export.png"
+
+    for size in IMAGE_SIZES[:1] if quick else IMAGE_SIZES:
+        image = synthetic_boulder(size)
+        for scale in (1, 4):
+            for transparent in (False, True):
+                yield bench("export_png",
+                            lambda: export_png(path, image, scale, transparent),
+                            number=1 if size > 256 else 5,
+                            size=size,
+                            scale=scale,
+                            transparent=transparent)
+
+
+BENCHMARKS = (bench_poke,
+              bench_layered_poke,
+              bench_undo,
+              bench_replay,
+              bench_pebble_step,
+              bench_load_boulder,
+              bench_save_load,
+              bench_export_png)
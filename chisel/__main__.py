@@ -2,37 +2,66 @@
 SMASH ROCK!  FASTER SWING = MORE ROCK SMASHED! This app is a pre-historically accurate
 representation of Paleolithic technology!  Re-invent the wheel with this (rock)cutting-edge
 simulation! A caveman workout routine guaranteed to give you chiseled slabs fast!
+
+Pass --profile-startup to print how long imports and building each widget take, and --mode
+layered or --mode strata to carve a boulder with layers of stone.  --record PATH records input to
+a log that --replay PATH plays back in real time.
 """
+from argparse import ArgumentParser
 from pathlib import Path
+import sys
+
+from .utils.profiling import StartupProfile
+
+STARTUP_BUDGET = 1.5  # Seconds until first frame.
+PROFILE = StartupProfile(STARTUP_BUDGET)
+
+with PROFILE.measure("import chisel.engine"):
+    from .engine import MODES
 
-from kivy.app import App
-from kivy.core.window import Window
-from kivy.uix.floatlayout import FloatLayout
-from kivy.uix.relativelayout import RelativeLayout
-from kivy.garden.navigationdrawer import NavigationDrawer
+# Kivy parses the command line itself and rejects options it doesn't know, so ours are removed.
+parser = ArgumentParser(prog="python -m chisel", add_help=False)
+parser.add_argument("--profile-startup", action="store_true")
+parser.add_argument("--mode", choices=MODES, default="classic")
+parser.add_argument("--record", type=Path)
+parser.add_argument("--replay", type=Path)
+ARGS, sys.argv[1:] = parser.parse_known_args()
 
-from .widgets import BurgerButton, Chisel, Cursor, OptionsPanel, ToolButton
+with PROFILE.measure("import kivy"):
+    from kivy.app import App
+    from kivy.clock import Clock
+    from kivy.core.window import Window
+    from kivy.uix.floatlayout import FloatLayout
+    from kivy.uix.relativelayout import RelativeLayout
+    from kivy.garden.navigationdrawer import NavigationDrawer
+
+with PROFILE.measure("import chisel.widgets"):
+    from .widgets import BurgerButton, Chisel, Cursor, OptionsPanel, ToolButton
 
 
 IMAGE_PATH = Path("assets", "img")
 ICON = str(IMAGE_PATH / "icon.png")
-TOOLS_NORMAL = (str(IMAGE_PATH / "cursor" / f"up_{i}.png") for i in range(3))
-TOOLS_SELECTED = (str(IMAGE_PATH / "cursor" / f"selected_{i}.png") for i in range(3))
+TOOLS_NORMAL = (f"cursor/up_{i}" for i in range(3))
+TOOLS_SELECTED = (f"cursor/selected_{i}" for i in range(3))
 
 
 class ChiselApp(App):
     def build(self):
         self.icon = ICON
-        cursor = Cursor()
+        with PROFILE.measure("Cursor()"):
+            cursor = Cursor()
         Window.minimum_width, Window.minimum_height = Window.size
         root = FloatLayout()
         navdrawer = NavigationDrawer()
         navdrawer.toggle_state()
         navdrawer.anim_type = "slide_above_anim"
 
-        chisel = Chisel()
+        with PROFILE.measure("Chisel()"):
+            # The first boulder is decoded on a worker thread; a blank one is drawn until then.
+            chisel = Chisel(model=MODES[ARGS.mode](blank=True))
 
-        options_panel = OptionsPanel(chisel)
+        with PROFILE.measure("OptionsPanel()"):
+            options_panel = OptionsPanel(chisel)
         navdrawer.add_widget(options_panel)
 
         burger = BurgerButton()
@@ -41,8 +70,9 @@ class ChiselApp(App):
         rel_layout = RelativeLayout()  # This layout allows navdrawer to push contained widgets.
         rel_layout.add_widget(chisel)
 
-        tools = (ToolButton(*args, chisel, cursor)
-                 for args in zip(range(3), TOOLS_NORMAL, TOOLS_SELECTED))
+        with PROFILE.measure("ToolButton()s"):
+            tools = [ToolButton(*args, chisel, cursor)
+                     for args in zip(range(3), TOOLS_NORMAL, TOOLS_SELECTED)]
 
         for tool in tools:
             tool.pos_hint = {"x": tool._id * .1 + .35, "y": .01}
@@ -51,7 +81,8 @@ class ChiselApp(App):
             rel_layout.add_widget(tool)
 
         navdrawer.add_widget(rel_layout)
-        options_panel.build()
+        with PROFILE.measure("OptionsPanel.build()"):
+            options_panel.build()
         options_panel.bind_to_burger(burger)
 
         def on_anim(instance, value):
@@ -62,8 +93,25 @@ class ChiselApp(App):
         root.add_widget(burger)
 
         Window.add_widget(cursor, canvas="after")
+
+        if ARGS.replay is not None:
+            Clock.schedule_once(lambda dt: chisel.replay(ARGS.replay))
+        elif ARGS.record is not None:
+            chisel.open_model(ARGS.mode, lambda: chisel.start_recording(ARGS.record, ARGS.mode))
+        else:
+            chisel.open_model(ARGS.mode)
+        self.chisel = chisel
+
+        if ARGS.profile_startup:
+            def report(window):
+                window.unbind(on_flip=report)
+                PROFILE.report()
+            Window.bind(on_flip=report)  # Once the first frame is drawn.
         return root
 
+    def on_stop(self):
+        self.chisel.stop_recording()
+
 
 if __name__ == "__main__":
     ChiselApp().run()
@@ -0,0 +1,8 @@
+from .export import composite, export_png  # noqa: F401
+from .model import ChiselModel, open_boulder, perceived_brightness  # noqa: F401
+from .layered import LayeredModel  # noqa: F401
+from .strata import StrataModel  # noqa: F401
+from .pebbles import PebbleSystem  # noqa: F401
+
+# Selectable with python -m chisel --mode
+MODES = {"classic": ChiselModel, "layered": LayeredModel, "strata": StrataModel}
@@ -0,0 +1,56 @@
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+from .model import SCALE_INVERSE, X_OFFSET, Y_OFFSET
+
+BACKGROUND = Path("assets", "img", "background.png")
+
+
+@lru_cache(maxsize=4)
+def background(width, height):
+    """Returns the background stretched to width x height as normalized rgba, bottom row first."""
+    from PIL import Image  # Imported lazily to keep it off the startup path.
+
+    with Image.open(BACKGROUND) as image:
+        image = image.convert("RGBA").resize((width, height), Image.NEAREST)
+    array = np.asarray(image, dtype=np.float32)[::-1] / 255
+    array.flags.writeable = False
+    return array
+
+
+def composite(image, scale=1, transparent=False):
+    """
+    Returns the boulder laid out as the chisel draws it, composited over the background (or
+    nothing, if transparent) as an rgba array, top row first.  The boulder is drawn at its native
+    resolution and the result is upscaled by the integer `scale` with nearest-neighbour sampling.
+    """
+    h, w, _ = image.shape
+    width, height = round(w * SCALE_INVERSE), round(h * SCALE_INVERSE)
+    left, bottom = round(width * X_OFFSET), round(height * Y_OFFSET)
+
+    if transparent:
+        canvas = np.zeros((height, width, 4), dtype=np.float32)
+    else:
+        canvas = background(width, height).copy()
+
+    # Alpha compositing of the boulder over the canvas:
+    region = canvas[bottom:bottom + h, left:left + w]
+    source = image.astype(np.float32) / 255
+    source_alpha, region_alpha = source[..., 3:], region[..., 3:]
+    alpha = source_alpha + region_alpha * (1 - source_alpha)
+    rgb = source[..., :3] * source_alpha + region[..., :3] * region_alpha * (1 - source_alpha)
+    region[..., :3] = rgb / np.where(alpha, alpha, 1)
+    region[..., 3:] = alpha
+
+    canvas = canvas[::-1]
+    if scale > 1:
+        canvas = canvas.repeat(scale, axis=0).repeat(scale, axis=1)
+    return (canvas * 255).round().astype(np.uint8)
+
+
+def export_png(path_to_file, image, scale=1, transparent=False):
+    from PIL import Image
+
+    Image.fromarray(composite(image, scale, transparent), "RGBA").save(path_to_file, format="png")
@@ -0,0 +1,77 @@
+import numpy as np
+
+
+def concatenated_ranges(starts, stops):
+    """Returns the concatenation of `range(start, stop)` for every start and stop, vectorized."""
+    lengths = np.maximum(stops - starts, 0)
+    total = lengths.sum()
+    if not total:
+        return np.empty(0, dtype=np.intp)
+
+    nonempty = lengths > 0
+    starts, lengths = starts[nonempty], lengths[nonempty]
+    # Each element is one more than the last, except at the start of each range where it jumps:
+    steps = np.ones(total, dtype=np.intp)
+    offsets = np.cumsum(lengths)[:-1]
+    steps[0] = starts[0]
+    steps[offsets] = starts[1:] - (starts[:-1] + lengths[:-1] - 1)
+    return np.cumsum(steps)
+
+
+class GridIndex:
+    """
+    Uniform grid over fixed 2d points.  Points are sorted by cell, row-major, so the points in a
+    row of neighbouring cells are one contiguous slice; queries only visit cells that overlap the
+    query's square instead of scanning every point.
+    """
+
+    def __init__(self, points, cell_size):
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        self.points = points
+        self.cell_size = cell_size
+        self.origin = points.min(axis=0) if len(points) else np.zeros(2)
+
+        cells = ((points - self.origin) // cell_size).astype(np.intp)
+        self.columns, self.rows = cells.max(axis=0) + 1 if len(points) else (0, 0)
+        cell_ids = cells[:, 1] * self.columns + cells[:, 0]
+
+        self.order = np.argsort(cell_ids, kind="stable")  # Point indices sorted by cell.
+        # Points in cell i are self.order[self.starts[i]:self.starts[i + 1]]:
+        self.starts = np.searchsorted(cell_ids[self.order], np.arange(self.rows * self.columns + 1))
+
+    def __len__(self):
+        return len(self.points)
+
+    def query_many(self, centers, radius):
+        """
+        Returns indices of points in cells within `radius` of each center, and the index of the
+        center each was found near.  These are candidates; distances still need to be checked.
+        """
+        centers = np.asarray(centers, dtype=float).reshape(-1, 2)
+        empty = np.empty(0, dtype=np.intp)
+        if not len(self) or not len(centers):
+            return empty, empty
+
+        low = np.floor((centers - radius - self.origin) / self.cell_size).astype(np.intp)
+        high = np.floor((centers + radius - self.origin) / self.cell_size).astype(np.intp)
+        low, high = np.maximum(low, 0), np.minimum(high, (self.columns - 1, self.rows - 1))
+
+        # One span of cells for every row of cells each center overlaps:
+        n_rows = np.maximum(high[:, 1] - low[:, 1] + 1, 0)
+        owner = np.repeat(np.arange(len(centers)), n_rows)
+        if not len(owner):
+            return empty, empty
+        first_row = np.repeat(low[:, 1], n_rows)
+        row = first_row + concatenated_ranges(np.zeros(len(n_rows), dtype=np.intp), n_rows)
+        first, last = low[owner, 0], high[owner, 0]
+        valid = first <= last
+        owner, row, first, last = owner[valid], row[valid], first[valid], last[valid]
+
+        span_starts = self.starts[row * self.columns + first]
+        span_stops = self.starts[row * self.columns + last + 1]
+        found = concatenated_ranges(span_starts, span_stops)
+        return self.order[found], np.repeat(owner, span_stops - span_starts)
+
+    def query(self, x, y, radius):
+        """Returns indices of points in cells within `radius` of (x, y)."""
+        return self.query_many((x, y), radius)[0]
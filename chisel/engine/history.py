@@ -0,0 +1,110 @@
+from collections import deque
+
+import numpy as np
+
+from .project import CODECS, DEFAULT_CODEC
+
+HISTORY_BYTES = 2**24  # Compressed size of every stroke kept for undo and redo.
+
+
+class Change:
+    """
+    Elements of one flat array changed by a stroke: their indices and their values before and
+    after, compressed.  Indices are sorted and stored as differences, which compress well.
+    """
+
+    def __init__(self, name, indices, before, after, codec=DEFAULT_CODEC):
+        self.name = name
+        self.codec = codec
+        self.length = len(indices)
+        self.dtype, self.shape = before.dtype, before.shape[1:]
+
+        compress, _ = CODECS[codec]
+        self.indices = compress(np.diff(indices, prepend=0).astype(np.int64).tobytes())
+        self.before = compress(np.ascontiguousarray(before).tobytes())
+        self.after = compress(np.ascontiguousarray(after).tobytes())
+        self.nbytes = len(self.indices) + len(self.before) + len(self.after)
+
+    def _decompress(self, data, dtype, shape=()):
+        _, decompress = CODECS[self.codec]
+        return np.frombuffer(decompress(data), dtype=dtype).reshape(self.length, *shape)
+
+    def decompressed(self, after=False):
+        """Returns the indices and the values before, or after, the stroke."""
+        indices = np.cumsum(self._decompress(self.indices, np.int64))
+        values = self._decompress(self.after if after else self.before, self.dtype, self.shape)
+        return indices, values
+
+
+class History:
+    """
+    Undo and redo of strokes.  Before a poke changes elements of a flat array, it records their
+    indices and old values; when the stroke ends, only the elements it changed are kept, as
+    compressed Changes.  Strokes are kept in a bounded ring buffer that drops the oldest ones once
+    they take more than `max_bytes`.
+    """
+
+    def __init__(self, max_bytes=HISTORY_BYTES):
+        self.max_bytes = max_bytes
+        self.undos = deque()
+        self.redos = deque()
+        self.nbytes = 0
+        self.recording = {}  # name: (array, [(indices, old values), ...]) of the open stroke
+
+    def __len__(self):
+        return len(self.undos)
+
+    def record(self, name, array, indices):
+        """Record the values of elements of a flat array that are about to change."""
+        _, chunks = self.recording.setdefault(name, (array, []))
+        chunks.append((indices, array[indices]))
+
+    def commit(self):
+        """End the open stroke.  Returns whether it changed anything."""
+        if not self.recording:
+            return False
+
+        stroke = []
+        for name, (array, chunks) in self.recording.items():
+            indices = np.concatenate([indices for indices, _ in chunks])
+            before = np.concatenate([values for _, values in chunks])
+            indices, first = np.unique(indices, return_index=True)  # First record of each element.
+            stroke.append(Change(name, indices, before[first], array[indices]))
+        self.recording = {}
+
+        self._drop(self.redos, len(self.redos))
+        self.undos.append(stroke)
+        self.nbytes += sum(change.nbytes for change in stroke)
+        while self.nbytes > self.max_bytes and self.undos:
+            self._drop(self.undos, 1)
+        return True
+
+    def _drop(self, strokes, n):
+        """Drop n strokes from the left of `strokes`."""
+        for _ in range(n):
+            self.nbytes -= sum(change.nbytes for change in strokes.popleft())
+
+    def undo(self):
+        """
+        Returns (name, indices, values) of elements to patch to undo the last stroke, or None if
+        there's nothing to undo.
+        """
+        if not self.undos:
+            return None
+        stroke = self.undos.pop()
+        self.redos.append(stroke)
+        return [(change.name, *change.decompressed()) for change in stroke]
+
+    def redo(self):
+        """Like `undo`, but returns the elements to patch to redo the last undone stroke."""
+        if not self.redos:
+            return None
+        stroke = self.redos.pop()
+        self.undos.append(stroke)
+        return [(change.name, *change.decompressed(after=True)) for change in stroke]
+
+    def clear(self):
+        self.undos.clear()
+        self.redos.clear()
+        self.nbytes = 0
+        self.recording = {}
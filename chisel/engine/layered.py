@@ -0,0 +1,181 @@
+from functools import lru_cache
+from random import choice
+
+import numpy as np
+
+from .grid import GridIndex
+from .history import HISTORY_BYTES
+from .model import (BOULDER_IMAGE_PATHS, IMAGE_SCALE, SCALE_INVERSE, X_OFFSET, Y_OFFSET,
+                    ChiselModel, open_boulder, read_boulder)
+from .pebbles import PEBBLE_CAPACITY
+
+PEBBLE_COUNT = 3e4  # per layer.
+LAYER_SHADES = .4, .6, 1  # Color scale of each layer of stone, bottom layer first.
+
+CHISEL_RADIUS = 6e-4  # Pokes reach pebbles within this squared distance.
+REACH = CHISEL_RADIUS**.5
+MIN_POWER = 1e-5
+CHISEL_POWER = 100
+DISLODGE_VELOCITY = 1e-3
+MAX_VELOCITY = .2
+
+
+@lru_cache(maxsize=None)
+def sampled_boulder(path_to_image, pebble_count=PEBBLE_COUNT):
+    """
+    Returns a boulder asset sampled so it has about `pebble_count` pixels in the asset's aspect
+    ratio, bottom row first.  The result is read-only.
+    """
+    image = read_boulder(path_to_image, dim=None)
+    h, w, _ = image.shape
+
+    pebbles_per_row = max(1, int((pebble_count * w / h)**.5))
+    pebbles_per_column = max(1, int(pebbles_per_row * h / w))
+    rows = np.arange(pebbles_per_column) * h // pebbles_per_column
+    columns = np.arange(pebbles_per_row) * w // pebbles_per_row
+
+    image = image[rows[:, None], columns]
+    image.flags.writeable = False
+    return image
+
+
+class LayeredModel(ChiselModel):
+    """
+    The layered boulder of the original engine.  Every opaque pixel of the boulder is a site with
+    one pebble in each layer; `image` shows the top-most attached pebble of each site.
+
+    Pebbles are kept in arrays indexed by layer and site, and sites are kept in a uniform grid
+    with cells as large as a poke's reach, so a poke only visits sites in nearby cells.  Tool `i`
+    can't chisel layers below `i`.
+    """
+
+    mode = "layered"
+    map_projects = False  # Every pixel is read to find the sites anyway.
+
+    def __init__(self, path_to_image=None, pebble_capacity=PEBBLE_CAPACITY,
+                 pebble_count=PEBBLE_COUNT, history_bytes=HISTORY_BYTES, blank=False):
+        self.pebble_count = pebble_count
+        super().__init__(path_to_image, pebble_capacity, history_bytes=history_bytes, blank=blank)
+
+    def load_boulder(self, path_to_image=None):
+        if path_to_image is None:
+            path_to_image = choice(BOULDER_IMAGE_PATHS)
+            self.set_boulder(sampled_boulder(path_to_image, self.pebble_count), path_to_image.name)
+        else:
+            self.set_boulder(*open_boulder(path_to_image, mode=self.mode, mmap=self.map_projects))
+
+    def set_boulder(self, image, source=None, brightness=None, state=None):
+        """
+        Replace the boulder with fresh layers; each opaque pixel of the image is a site.  `state`
+        from a saved project restores the sites, their colors and which pebbles are still attached
+        instead.  `brightness` isn't used by this model.
+        """
+        self.source = source
+
+        if state is not None:  # Sites carved through are transparent in the image.
+            image = np.zeros(image.shape, dtype=np.uint8)
+            image.reshape(-1, 4)[state["sites"]] = state["colors"]
+
+        h, w, _ = image.shape
+        flat_image = image.reshape(-1, 4)
+        self.sites = np.flatnonzero(flat_image[:, -1])  # Pixel of each site.
+        site_colors = flat_image[self.sites]
+
+        n_layers = len(LAYER_SHADES)
+        shades = np.array(LAYER_SHADES)[:, None, None]
+        self.colors = np.empty((n_layers, len(self.sites), 4), dtype=np.uint8)
+        self.colors[..., :-1] = site_colors[:, :-1] * shades
+        self.colors[..., -1] = site_colors[:, -1]
+        self.attached = np.ones((n_layers, len(self.sites)), dtype=bool)
+
+        ys, xs = np.divmod(self.sites, w)
+        self.positions = np.column_stack((xs * IMAGE_SCALE / w + X_OFFSET,
+                                          ys * IMAGE_SCALE / h + Y_OFFSET))
+        self.index = GridIndex(self.positions, REACH)
+
+        if state is not None:
+            self.attached[:] = state["attached"]
+
+        self.image = np.zeros((h, w, 4), dtype=np.uint8)
+        layers = self.top_layers(np.arange(len(self.sites)))
+        sites = np.flatnonzero(layers != -1)
+        self.image.reshape(-1, 4)[self.sites[sites]] = self.colors[layers[sites], sites]
+        # Strokes are sampled about every `radius` pixels; about half a poke's reach.
+        self.radius = max(1, int(REACH * SCALE_INVERSE * min(w, h) / 2))
+
+        self.dirty = None
+        self.pebbles.clear()
+        self.history.clear()
+
+    def flat_arrays(self):
+        return {"image": self.image.reshape(-1, 4), "attached": self.attached.reshape(-1)}
+
+    def saved_state(self):
+        return {"sites": self.sites.copy(), "colors": self.colors[-1].copy(),
+                "attached": self.attached.copy()}
+
+    def top_layers(self, sites):
+        """Returns the top-most attached layer of each site, or -1 if every layer is gone."""
+        attached = self.attached[::-1, sites]
+        return np.where(attached.any(axis=0), len(attached) - 1 - attached.argmax(axis=0), -1)
+
+    @staticmethod
+    def poke_power(touch_pos, touch_vel, pebble_x, pebble_y):
+        """
+        Returns the force vectors of pokes on pebbles; pebbles out of reach get no force.
+        touch_pos and touch_vel are the position and velocity of the poke that hit each pebble.
+        """
+        dx, dy = pebble_x - touch_pos[:, 0], pebble_y - touch_pos[:, 1]
+        distance = dx**2 + dy**2
+        out_of_reach = distance > CHISEL_RADIUS
+        distance[distance == 0] = 1e-4
+        touch_velocity = (touch_vel**2).sum(axis=1)
+
+        power = np.maximum(CHISEL_POWER * touch_velocity, MIN_POWER) / distance
+        power[out_of_reach] = 0
+        return np.column_stack((power * dx, power * dy))
+
+    def poke_many(self, points, velocities):
+        """
+        Poke the boulder at every point at once, dislodging the top-most pebble of each site a poke
+        is strong enough to move.  A site hit by more than one poke is only chiselled once.
+        Returns number of pebbles created.
+        """
+        sites, owner = self.index.query_many(points, REACH)
+        if not len(sites):
+            return 0
+
+        px, py = self.positions[sites].T
+        forces = self.poke_power(points[owner], velocities[owner], px, py)
+        magnitude = np.hypot(*forces.T)
+        dislodged = magnitude >= DISLODGE_VELOCITY
+        sites, forces, magnitude = sites[dislodged], forces[dislodged], magnitude[dislodged]
+
+        sites, first = np.unique(sites, return_index=True)
+        forces, magnitude = forces[first], magnitude[first]
+
+        layers = self.top_layers(sites)
+        eligible = layers >= self.tool
+        if not eligible.any():
+            return 0
+        sites, layers = sites[eligible], layers[eligible]
+        forces = forces[eligible] * np.minimum(1, MAX_VELOCITY / magnitude[eligible])[:, None]
+
+        pixels = self.sites[sites]
+        flat_image = self.image.reshape(-1, 4)
+        flat_attached = self.attached.reshape(-1)
+        self.history.record("attached", flat_attached, layers * len(self.sites) + sites)
+        self.history.record("image", flat_image, pixels)
+
+        self.attached[layers, sites] = False
+        self.pebbles.add(self.positions[sites], forces, self.colors[layers, sites])
+
+        # Uncover the layer below:
+        below = self.top_layers(sites)
+        flat_image[pixels] = self.colors[below, sites]
+        flat_image[pixels[below == -1]] = 0
+
+        h, w, _ = self.image.shape
+        ys, xs = np.divmod(pixels, w)
+        self.mark_dirty(xs.min(), ys.min(), xs.max() + 1, ys.max() + 1)
+        return len(sites)
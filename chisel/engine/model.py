@@ -0,0 +1,346 @@
+from functools import lru_cache
+from pathlib import Path
+from random import choice
+
+import numpy as np
+
+from . import project
+from .history import HISTORY_BYTES, History
+from .pebbles import PEBBLE_CAPACITY, PebbleSystem
+
+IMAGE_SCALE = .75
+SCALE_INVERSE = 1 / IMAGE_SCALE
+X_OFFSET = (1 - IMAGE_SCALE) / 2
+Y_OFFSET = .1
+IMAGE_DIM = 100, 100
+
+RADIUS = 1
+BRIGHTNESS_TILE = 64  # Brightness is computed lazily in tiles of this size.
+STROKE_BUDGET = 64  # Maximum pokes sampled along a single segment of a stroke.
+MIN_POWER = 1e-5
+CHISEL_POWER = 1e3
+
+BOULDER_IMAGE_PATHS = tuple(Path("assets", "img", "boulder", f"{i}.png") for i in range(5))
+
+
+def brush(radius):
+    """Returns pixel offsets of a poke of the given radius."""
+    return np.indices((2 * radius + 1, 2 * radius + 1)).reshape(2, -1).T - radius
+
+
+def read_boulder(path_to_image, dim=IMAGE_DIM):
+    """Returns a boulder asset as an rgba array, bottom row first, shrunk to fit `dim` if given."""
+    from PIL import Image  # Imported lazily to keep it off the startup path.
+
+    image = Image.open(path_to_image)
+    if dim is not None:
+        image.thumbnail(dim, Image.NEAREST)
+    w, h = image.size
+    image = np.frombuffer(image.tobytes(), dtype=np.uint8)
+    image = image.reshape((h, w, 4))[::-1, :, :].copy()
+
+    alpha_channel = image[:, :, -1]  # Fix some slightly transparent pixels
+    alpha_channel[alpha_channel > 127] = 255
+    return image
+
+
+def _linearize(normal):
+    return np.where(normal <= .04045, normal / 12.92, ((normal + .055) / 1.055)**2.4)
+
+
+LINEARIZED = _linearize(np.arange(256) / 255)  # sRGB linearization of every 8-bit value.
+
+
+def perceived_brightness(colors):
+    """Returns the perceived brightness of 8-bit colors."""
+    luminance = LINEARIZED[colors] @ (.2126, .7152, .0722)
+    brightness = np.where(luminance <= .008856, luminance * 903.3, luminance**(1 / 3) * 116 - 16)
+    return brightness.astype(np.float32)
+
+
+@lru_cache(maxsize=None)
+def decoded_boulder(path_to_image):
+    """Returns the read-only image and brightness plane of a boulder asset, decoded only once."""
+    image = read_boulder(path_to_image)
+    brightness = perceived_brightness(image[..., :-1])
+    image.flags.writeable = brightness.flags.writeable = False
+    return image, brightness
+
+
+def preload_boulders():
+    """Decode every boulder asset ahead of time so later resets are just copies."""
+    for path in BOULDER_IMAGE_PATHS:
+        decoded_boulder(path)
+
+
+def open_boulder(path_to_image=None, with_brightness=False, mode="classic", mmap=False):
+    """
+    Returns the image, source boulder asset, brightness plane and model state of a random boulder
+    asset, or of a project if a path is given.  Boulder assets are decoded once and always come
+    with their brightness plane.  For projects, the brightness plane is None unless
+    `with_brightness`; it's never computed for memory-mapped projects.  Safe to call from any
+    thread.
+
+    Projects are read in full, and their checksums verified, unless `mmap`: then raw and .npy
+    projects are memory-mapped and only read where they're used, possibly on another thread.
+
+    The state is None unless the project was saved with the state of a `mode` model; see
+    `ChiselModel.saved_state`.  Raises ValueError if the project holds another mode's state.
+    """
+    if path_to_image is None:
+        path_to_image = choice(BOULDER_IMAGE_PATHS)
+        image, brightness = decoded_boulder(path_to_image)
+        return image.copy(), path_to_image.name, brightness.copy(), None
+
+    image, metadata = project.load(path_to_image, mmap=mmap)
+    source, state = metadata.get("boulder"), metadata["arrays"] or None
+    saved_mode = metadata.get("mode", "classic")
+    if state is not None and saved_mode != mode:
+        raise ValueError(f"project was carved in {saved_mode} mode, not {mode} mode")
+
+    if with_brightness and not isinstance(image, np.memmap):
+        return image, source, perceived_brightness(image[..., :-1]), state
+    return image, source, None, state
+
+
+class ChiselModel:
+    """
+    The boulder and the carving logic, without Kivy.  Pokes are in touch coordinates: (0, 0) is
+    the bottom-left and (1, 1) the top-right of the chisel.
+    """
+
+    mode = "classic"  # Name of the model in MODES.
+    map_projects = True  # Projects are memory-mapped, so only pixels that are carved are read.
+
+    def __init__(self, path_to_image=None, pebble_capacity=PEBBLE_CAPACITY, radius=RADIUS,
+                 history_bytes=HISTORY_BYTES, blank=False):
+        """If `blank`, the model starts on a transparent boulder instead of decoding one."""
+        self.tool = 0  # 0, 1, or 2
+        self.radius = radius
+        self.brush = brush(radius)
+        self.pebbles = PebbleSystem(pebble_capacity)
+        self.history = History(history_bytes)
+        if blank:
+            self.set_boulder(np.zeros((*IMAGE_DIM, 4), dtype=np.uint8))
+        else:
+            self.load_boulder(path_to_image)
+
+    def load_boulder(self, path_to_image=None):
+        self.set_boulder(*open_boulder(path_to_image, mode=self.mode, mmap=self.map_projects))
+
+    def set_boulder(self, image, source=None, brightness=None, state=None):
+        """
+        Replace the boulder.  Unless a precomputed brightness plane is given, brightness is only
+        computed for tiles that are poked, so memory-mapped images are only read where they're
+        carved.  Zeroed arrays are allocated lazily by the OS.  This model has no state besides
+        the image, so `state` isn't used.
+        """
+        self.image = image
+        self.source = source  # Boulder asset the image was carved from.
+
+        h, w, _ = image.shape
+        tiles = -(-h // BRIGHTNESS_TILE), -(-w // BRIGHTNESS_TILE)
+        if brightness is None:
+            self.brightness = np.zeros((h, w), dtype=np.float32)
+            self.brightness_ready = np.zeros(tiles, dtype=bool)
+        else:
+            self.brightness = brightness
+            self.brightness_ready = np.ones(tiles, dtype=bool)
+
+        self.dirty = None  # Bounds (l, t, r, b) of the image region changed since `take_dirty`.
+        self.pebbles.clear()
+        self.history.clear()
+
+    def mark_dirty(self, left, top, right, bottom):
+        """Merge bounds into the dirty region."""
+        if self.dirty is not None:
+            l, t, r, b = self.dirty
+            left, top, right, bottom = min(left, l), min(top, t), max(right, r), max(bottom, b)
+        self.dirty = left, top, right, bottom
+
+    def ensure_brightness(self, left, top, right, bottom):
+        """Compute brightness of every tile overlapping the bounds that hasn't been computed yet."""
+        n = BRIGHTNESS_TILE
+        tile_top, tile_left = top // n, left // n
+        ready = self.brightness_ready[tile_top:-(-bottom // n), tile_left:-(-right // n)]
+        for i, j in zip(*np.nonzero(~ready)):
+            rows = slice((tile_top + i) * n, (tile_top + i + 1) * n)
+            columns = slice((tile_left + j) * n, (tile_left + j + 1) * n)
+            self.brightness[rows, columns] = perceived_brightness(self.image[rows, columns, :-1])
+        ready[:] = True
+
+    def take_dirty(self):
+        """Returns the dirty region, or None if nothing changed, and clears it."""
+        dirty, self.dirty = self.dirty, None
+        return dirty
+
+    @staticmethod
+    def poke_power(touch_pos, touch_vel, pixel_x, pixel_y):
+        """
+        Returns the force vectors of pokes on pixels.  touch_pos and touch_vel are the position
+        and velocity of the poke that hit each pixel.
+        """
+        dx, dy = pixel_x - touch_pos[:, 0], pixel_y - touch_pos[:, 1]
+
+        distance = np.maximum(.001, dx**2 + dy**2)
+        touch_velocity = (touch_vel**2).sum(axis=1)
+
+        power = np.maximum(MIN_POWER, CHISEL_POWER * touch_velocity) / distance
+
+        return np.column_stack((power * dx, power * dy))
+
+    def poke(self, x, y, vx, vy):
+        """Poke the boulder at (x, y) with velocity (vx, vy).  Returns number of pebbles created."""
+        return self.poke_many(np.array([(x, y)]), np.array([(vx, vy)]))
+
+    def brushed(self, points, velocities):
+        """
+        Returns the pokes inside the image, the flat index of every pixel within radius of them,
+        and the index of the poke that hit each pixel.  A pixel hit by more than one poke is only
+        returned once.
+        """
+        x, y = SCALE_INVERSE * (points - (X_OFFSET, Y_OFFSET)).T
+        inside = (0 <= x) & (x <= 1) & (0 <= y) & (y <= 1)
+        points, velocities = points[inside], velocities[inside]
+        if not inside.any():
+            return points, velocities, np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+
+        h, w, _ = self.image.shape
+        # Image coordinates of pixels in center of pokes
+        centers = np.column_stack(((x[inside] * w).astype(int), (y[inside] * h).astype(int)))
+
+        # Every pixel within radius of a poke, tagged with the poke that hit it:
+        brush = centers[:, None] + self.brush
+        owner = np.broadcast_to(np.arange(len(centers))[:, None], brush.shape[:2])
+        valid = ((0 <= brush) & (brush < (w, h))).all(axis=-1)
+        xs, ys = brush[valid].T
+        pixels, first = np.unique(ys * w + xs, return_index=True)
+        return points, velocities, pixels, owner[valid][first]
+
+    def release_pebbles(self, points, velocities, pixels, owner, colors):
+        """Create pebbles of the given colors at pixels knocked loose by pokes."""
+        h, w, _ = self.image.shape
+        ys, xs = np.divmod(pixels, w)
+
+        px, py = xs * IMAGE_SCALE / w + X_OFFSET, ys * IMAGE_SCALE / h + Y_OFFSET
+        forces = self.poke_power(points[owner], velocities[owner], px, py)
+        self.pebbles.add(np.column_stack((px, py)), forces, colors)
+
+        self.mark_dirty(xs.min(), ys.min(), xs.max() + 1, ys.max() + 1)
+
+    def poke_many(self, points, velocities):
+        """
+        Poke the boulder at every point at once.  A pixel hit by more than one poke is only
+        chiselled once.  Returns number of pebbles created.
+        """
+        points, velocities, pixels, owner = self.brushed(points, velocities)
+        if not len(pixels):
+            return 0
+
+        w = self.image.shape[1]
+        ys, xs = np.divmod(pixels, w)
+        self.ensure_brightness(xs.min(), ys.min(), xs.max() + 1, ys.max() + 1)
+
+        # Pixels that are visible and bright enough for the current tool:
+        flat_image = self.image.reshape(-1, 4)
+        flat_brightness = self.brightness.reshape(-1)
+        colors = flat_image[pixels]
+        eligible = (colors[:, -1] != 0) & (flat_brightness[pixels] >= 20 * self.tool)
+        if not eligible.any():
+            return 0
+        pixels, owner, colors = pixels[eligible], owner[eligible], colors[eligible]
+
+        self.release_pebbles(points, velocities, pixels, owner, colors)
+        self.history.record("image", flat_image, pixels)
+        self.history.record("brightness", flat_brightness, pixels)
+
+        # Darken area; pixels that become too dark are removed:
+        darker = (colors[:, :-1] * .8).astype(np.uint8)
+        darker_brightness = perceived_brightness(darker)
+        removed = darker_brightness < 15
+        kept = ~removed
+        flat_image[pixels[removed], -1] = 0
+        flat_image[pixels[kept], :-1] = darker[kept]
+        flat_brightness[pixels[kept]] = darker_brightness[kept]
+
+        return len(pixels)
+
+    def flat_arrays(self):
+        """Returns flat views of the arrays pokes change, by the names `history` records them as."""
+        return {"image": self.image.reshape(-1, 4), "brightness": self.brightness.reshape(-1)}
+
+    def patch(self, changes):
+        """Write changes from `history` to the arrays they were recorded from."""
+        if changes is None:
+            return False
+
+        arrays = self.flat_arrays()
+        w = self.image.shape[1]
+        for name, indices, values in changes:
+            arrays[name][indices] = values
+            if name == "image" and len(indices):
+                ys, xs = np.divmod(indices, w)
+                self.mark_dirty(xs.min(), ys.min(), xs.max() + 1, ys.max() + 1)
+        return True
+
+    def undo(self):
+        """Undo the last stroke.  Returns False if there was nothing to undo."""
+        self.history.commit()
+        return self.patch(self.history.undo())
+
+    def redo(self):
+        """Redo the last undone stroke.  Returns False if there was nothing to redo."""
+        return self.patch(self.history.redo())
+
+    def stroke(self, segments, budget=STROKE_BUDGET):
+        """
+        Poke along segments (x0, y0, x1, y1, vx, vy) in one batched pass.  Segments are sampled
+        about every `radius` pixels so fast swings leave no gaps; at most `budget` pokes are
+        sampled per segment.  The start of each segment isn't poked.  Returns number of pebbles
+        created.
+        """
+        if not segments:
+            return 0
+
+        h, w, _ = self.image.shape
+        points, velocities = [], []
+        for x0, y0, x1, y1, vx, vy in segments:
+            length = SCALE_INVERSE * max(abs(x1 - x0) * w, abs(y1 - y0) * h)  # in pixels
+            n = min(budget, max(1, int(np.ceil(length / max(self.radius, 1)))))
+            t = np.arange(1, n + 1)[:, None] / n
+            points.append(np.add((x0, y0), t * (x1 - x0, y1 - y0)))
+            velocities.append(np.broadcast_to((vx, vy), (n, 2)))
+
+        return self.poke_many(np.concatenate(points), np.concatenate(velocities))
+
+    def unmap(self, path_to_file):
+        """
+        Copy the image into memory if it's memory-mapped from `path_to_file`.  Windows can't
+        replace a mapped file, so this must be called before saving over the image's own source.
+        """
+        image = self.image
+        if (isinstance(image, np.memmap) and image.filename is not None
+                and Path(image.filename).resolve() == Path(path_to_file).resolve()):
+            self.image = np.array(image)
+
+    def saved_state(self):
+        """
+        Returns copies of the arrays, besides the image, that `set_boulder` needs to restore the
+        boulder from a project.
+        """
+        return {}
+
+    def save(self, path_to_file, codec=None, image=None, state=None):
+        """
+        Save the image and state as a project.  Snapshots of the image and `saved_state` can be
+        passed to save from another thread while carving continues.
+        """
+        if image is None:
+            self.unmap(path_to_file)
+            image = self.image
+        if state is None:
+            state = self.saved_state()
+        if codec is None:
+            codec = project.default_codec(image)
+        project.save(path_to_file, image, codec, arrays=state, mode=self.mode, tool=self.tool,
+                     boulder=self.source)
@@ -0,0 +1,101 @@
+import numpy as np
+
+GRAVITY = .01
+FRICTION = .9
+TIMESTEP = 1 / 30  # Simulated seconds per step.
+
+PEBBLE_CAPACITY = 2**12  # Size of the pebble pool; oldest pebbles are recycled past this.
+
+
+class PebbleSystem:
+    """
+    Simple gravity physics for all falling pebbles at once.  Pebbles live in a fixed pool of
+    slots: positions, velocities and colors are preallocated arrays, landed pebbles return their
+    slot to a free list, and once the pool is full the oldest pebbles are recycled.
+    """
+
+    def __init__(self, capacity=PEBBLE_CAPACITY):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+
+        self.capacity = capacity
+        self.positions = np.zeros((capacity, 2))
+        self.previous = np.zeros((capacity, 2))  # Positions at previous step, for interpolation.
+        self.velocities = np.zeros((capacity, 2))
+        self.colors = np.zeros((capacity, 4), dtype=np.uint8)
+        self.born = np.zeros(capacity, dtype=np.int64)  # Spawn order of the pebble in each slot.
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.free = np.empty(capacity, dtype=np.intp)  # Stack of free slots.
+        self.clear()
+
+    def __len__(self):
+        return self.capacity - self.n_free
+
+    def allocate(self, n):
+        """Return n slots, recycling the oldest pebbles if there aren't enough free slots."""
+        n = min(n, self.capacity)
+        from_free = min(n, self.n_free)
+        self.n_free -= from_free
+        slots = self.free[self.n_free:self.n_free + from_free].copy()
+
+        culled = n - from_free
+        if culled:
+            alive = np.flatnonzero(self.alive)
+            oldest = alive[np.argpartition(self.born[alive], culled - 1)[:culled]]
+            slots = np.concatenate((slots, oldest))
+
+        return slots
+
+    def add(self, positions, velocities, colors):
+        """Add pebbles; colors are rgba bytes."""
+        if not len(positions):
+            return
+
+        positions, velocities, colors = (
+            np.asarray(array)[-self.capacity:] for array in (positions, velocities, colors)
+        )
+        slots = self.allocate(len(positions))
+
+        self.positions[slots] = self.previous[slots] = positions
+        self.velocities[slots] = velocities
+        self.colors[slots] = colors
+        self.born[slots] = np.arange(self.spawned, self.spawned + len(slots))
+        self.spawned += len(slots)
+        self.alive[slots] = True
+
+    def step(self):
+        """Gravity Physics; advances pebbles by one fixed timestep."""
+        slots = np.flatnonzero(self.alive)
+        positions, velocities = self.positions[slots], self.velocities[slots]
+        self.previous[slots] = positions
+
+        velocities *= FRICTION
+        velocities[:, 1] -= GRAVITY
+        # Bounce off walls
+        x = positions[:, 0]
+        velocities[(x <= 0) | (x >= 1), 0] *= -1
+        positions += velocities
+
+        self.positions[slots] = positions
+        self.velocities[slots] = velocities
+
+        landed = slots[positions[:, 1] < 0]
+        self.alive[landed] = False
+        self.free[self.n_free:self.n_free + len(landed)] = landed
+        self.n_free += len(landed)
+
+    def interpolated(self, alpha=1):
+        """
+        Returns the slots of falling pebbles and their positions `alpha` of the way from the
+        previous step to the current one.
+        """
+        slots = np.flatnonzero(self.alive)
+        previous = self.previous[slots]
+        return slots, previous + alpha * (self.positions[slots] - previous)
+
+    def clear(self):
+        """Drop every pebble."""
+        self.alive[:] = False
+        self.free[:] = np.arange(self.capacity)[::-1]
+        self.n_free = self.capacity
+        self.spawned = 0
@@ -0,0 +1,170 @@
+from itertools import chain
+import json
+import os
+from pathlib import Path
+import struct
+from tempfile import NamedTemporaryFile
+import zlib
+
+import numpy as np
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MAGIC = b"CHISEL"
+NUMPY_MAGIC = b"\x93NUMPY"  # Projects used to be plain .npy files.
+VERSION = 2  # Version 2 added extra arrays.
+HEADER = struct.Struct("<6sHI")  # magic, version, length of json metadata
+TILE_HEADER = struct.Struct("<II")  # length of compressed tile, crc32 of uncompressed tile
+TILE_SIZE = 128
+MMAP_PIXELS = 4096**2  # Images at least this large are saved raw by default so they can be mapped.
+# The umask can only be read by setting it, which isn't safe once saves run on other threads:
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+CODECS = {"raw": (bytes, bytes),
+          "zlib": (zlib.compress, zlib.decompress)}
+CODEC_ERRORS: tuple = (zlib.error,)
+if zstandard is not None:
+    CODECS["zstd"] = (zstandard.ZstdCompressor().compress,
+                      zstandard.ZstdDecompressor().decompress)
+    CODEC_ERRORS += (zstandard.ZstdError,)
+DEFAULT_CODEC = "zstd" if "zstd" in CODECS else "zlib"
+
+
+def default_codec(image):
+    """Returns "raw" for images large enough that mapping beats compression, else DEFAULT_CODEC."""
+    h, w, _ = image.shape
+    return "raw" if h * w >= MMAP_PIXELS else DEFAULT_CODEC
+
+
+def tiles(shape, tile_size):
+    """Yields row and column slices of each tile of an image, row by row."""
+    h, w, *_ = shape
+    for top in range(0, h, tile_size):
+        for left in range(0, w, tile_size):
+            yield slice(top, top + tile_size), slice(left, left + tile_size)
+
+
+def save(path_to_file, image, codec=DEFAULT_CODEC, tile_size=TILE_SIZE, arrays=None, **metadata):
+    """
+    Stream an rgba image to a project file as compressed tiles, each with a checksum.  `arrays`
+    maps names to extra arrays, e.g. a model's state, that are stored after the image, each
+    compressed as one tile.  Extra keyword arguments are stored as json metadata.  Raw images are
+    stored as a single tile so they can be memory-mapped.
+
+    The project is written to a temporary file that then replaces `path_to_file`.  Windows can't
+    replace a file that's memory-mapped, so an image mapped from `path_to_file` must be copied into
+    memory and the mapping dropped first; see `ChiselModel.unmap`.
+    """
+    compress, _ = CODECS[codec]
+    if codec == "raw":
+        tile_size = max(image.shape[:2])
+    arrays = {name: np.ascontiguousarray(array) for name, array in (arrays or {}).items()}
+    metadata = dict(metadata, shape=image.shape, codec=codec, tile_size=tile_size,
+                    arrays={name: {"dtype": array.dtype.str, "shape": array.shape}
+                            for name, array in arrays.items()})
+    encoded = json.dumps(metadata).encode()
+
+    path = Path(path_to_file)
+    with NamedTemporaryFile("wb", dir=path.parent, prefix=path.name, delete=False) as file:
+        try:
+            file.write(HEADER.pack(MAGIC, VERSION, len(encoded)))
+            file.write(encoded)
+            image_tiles = (np.ascontiguousarray(image[rows, columns])
+                           for rows, columns in tiles(image.shape, tile_size))
+            for tile in chain(image_tiles, arrays.values()):
+                data = compress(tile)
+                file.write(TILE_HEADER.pack(len(data), zlib.crc32(tile)))
+                file.write(data)
+        except BaseException:
+            file.close()
+            os.remove(file.name)
+            raise
+
+    # Temporary files are only readable by their owner; give the project the usual permissions.
+    try:
+        os.chmod(file.name, 0o666 & ~UMASK)
+        os.replace(file.name, path)
+    except OSError:
+        os.remove(file.name)
+        raise
+
+
+def load(path_to_file, mmap=False):
+    """
+    Returns the image and metadata of a project file.  Raises ValueError if the file is corrupt or
+    not a project.
+
+    If `mmap` is true, raw and .npy projects are memory-mapped copy-on-write: pages are read when
+    first touched and changes are never written back.  Tile checksums aren't verified then.
+
+    Extra arrays saved with the project are returned in `metadata["arrays"]`, by name.
+    """
+    with open(path_to_file, "rb") as file:
+        if file.read(len(NUMPY_MAGIC)) == NUMPY_MAGIC:
+            file.seek(0)
+            image = np.load(path_to_file, mmap_mode="c") if mmap else np.load(file)
+            return _validated(image), {"shape": image.shape, "arrays": {}}
+
+        file.seek(0)
+        magic, version, length = HEADER.unpack(_read(file, HEADER.size))
+        if magic != MAGIC:
+            raise ValueError("not a chisel project")
+        if version > VERSION:
+            raise ValueError(f"unsupported project version {version}")
+
+        metadata = json.loads(_read(file, length))
+        if metadata["codec"] not in CODECS:
+            raise ValueError(f"unsupported codec {metadata['codec']!r}")
+        _, decompress = CODECS[metadata["codec"]]
+
+        if mmap and metadata["codec"] == "raw":
+            offset = file.tell() + TILE_HEADER.size
+            image = np.memmap(path_to_file, np.uint8, "c", offset, tuple(metadata["shape"]))
+            file.seek(offset + image.nbytes)
+        else:
+            image = np.empty(metadata["shape"], dtype=np.uint8)
+            for rows, columns in tiles(image.shape, metadata["tile_size"]):
+                region = image[rows, columns]
+                region[:] = _read_tile(file, decompress, np.uint8, region.shape)
+
+        arrays = metadata.get("arrays", {})
+        for name, array in arrays.items():
+            try:
+                dtype = np.dtype(array["dtype"])
+            except TypeError as error:
+                raise ValueError(f"unsupported dtype {array['dtype']!r}") from error
+            arrays[name] = _read_tile(file, decompress, dtype, array["shape"]).copy()
+        metadata["arrays"] = arrays
+
+    return _validated(image), metadata
+
+
+def _read_tile(file, decompress, dtype, shape):
+    length, checksum = TILE_HEADER.unpack(_read(file, TILE_HEADER.size))
+    try:
+        tile = decompress(_read(file, length))
+    except CODEC_ERRORS as error:
+        raise ValueError("corrupt tile") from error
+    if zlib.crc32(tile) != checksum:
+        raise ValueError("corrupt tile")
+    try:
+        return np.frombuffer(tile, dtype=dtype).reshape(shape)
+    except ValueError as error:
+        raise ValueError("corrupt tile") from error
+
+
+def _read(file, size):
+    data = file.read(size)
+    if len(data) != size:
+        raise ValueError("unexpected end of file")
+    return data
+
+
+def _validated(image):
+    if image.dtype != np.uint8 or image.ndim != 3 or image.shape[-1] != 4:
+        raise ValueError("project isn't an rgba image")
+    return image
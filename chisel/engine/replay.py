@@ -0,0 +1,154 @@
+"""
+Input logs: everything a session fed its model, so the session can be replayed exactly.
+
+Replay a log headlessly, as fast as possible, with:
+
+    python -m chisel.engine.replay session.chisel-log [--output final.chisel-project]
+"""
+from argparse import ArgumentParser
+from pathlib import Path
+import random
+import struct
+import sys
+import time
+
+import numpy as np
+
+from . import MODES
+from .model import STROKE_BUDGET
+
+MAGIC = b"CHISLOG"
+VERSION = 2  # Version 2 added the stroke budget.
+PREFIX = struct.Struct("<7sH")  # magic, version
+HEADER = struct.Struct("<7sHQ16sI")  # magic, version, seed of `random`, mode, stroke budget
+HEADER_V1 = struct.Struct("<7sHQ16s")  # Version 1 logs were recorded with the default budget.
+EVENT = np.dtype([("kind", "u1"),
+                  ("tool", "u1"),
+                  ("time", "<f8"),  # seconds since recording started
+                  ("values", "<f8", 6)])
+
+# Kinds of events and their values:
+DOWN = 0  # x, y, vx, vy of a poke
+MOVE = 1  # x0, y0, x1, y1, vx, vy of a stroke segment
+FRAME = 2  # pokes along the segments moved since the last frame
+UP = 3  # end of a stroke
+RESET = 4  # new random boulder
+UNDO = 5
+REDO = 6
+
+
+class Recorder:
+    """
+    Append events to an input log as they happen.  `random` is seeded with `seed` when recording
+    starts, so random boulders are the same on replay.  `budget` is the stroke budget frames are
+    applied with, so replays sample strokes the same way.
+    """
+
+    def __init__(self, path_to_file, mode, seed=None, budget=STROKE_BUDGET):
+        if seed is None:
+            seed = random.randrange(2**64)
+        self.seed = seed
+        self.mode = mode
+        self.budget = budget
+        self.start = time.perf_counter()
+        self.file = open(path_to_file, "wb")
+        self.file.write(HEADER.pack(MAGIC, VERSION, seed, mode.encode(), budget))
+        random.seed(seed)
+
+    def record(self, kind, tool, *values):
+        event = np.zeros((), dtype=EVENT)
+        event["kind"], event["tool"], event["time"] = kind, tool, time.perf_counter() - self.start
+        event["values"][:len(values)] = values
+        self.file.write(event.tobytes())
+        if kind == UP:
+            self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def read_log(path_to_file):
+    """Returns the seed, mode, stroke budget and events of an input log."""
+    data = Path(path_to_file).read_bytes()
+    if len(data) < PREFIX.size:
+        raise ValueError("not an input log")
+
+    magic, version = PREFIX.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("not an input log")
+    if version > VERSION:
+        raise ValueError(f"input log version {version} is newer than supported ({VERSION})")
+
+    header = HEADER if version > 1 else HEADER_V1
+    if len(data) < header.size:
+        raise ValueError("not an input log")
+    _, _, seed, mode, *budget = header.unpack_from(data)
+    budget = budget[0] if budget else STROKE_BUDGET
+
+    # A partial event at the end is from a session that didn't close the log.
+    events = data[header.size:]
+    events = np.frombuffer(events[:len(events) - len(events) % EVENT.itemsize], dtype=EVENT)
+    return seed, mode.rstrip(b"\0").decode(), budget, events
+
+
+def apply(model, event, segments, budget=STROKE_BUDGET):
+    """
+    Apply one event to a model; `segments` collects stroke segments until the next frame, which
+    strokes them with `budget`.
+    """
+    kind, tool, values = event["kind"], event["tool"], event["values"]
+    model.tool = int(tool)
+
+    if kind == DOWN:
+        return model.poke(*values[:4])
+    if kind == MOVE:
+        segments.append(tuple(values))
+    elif kind == FRAME:
+        created = model.stroke(segments, budget)
+        segments.clear()
+        return created
+    elif kind == UP:
+        model.history.commit()
+    elif kind == RESET:
+        model.load_boulder()
+    elif kind == UNDO:
+        model.undo()
+    elif kind == REDO:
+        model.redo()
+    return 0
+
+
+def replay(path_to_file, **model_options):
+    """Replay an input log on a new model as fast as possible.  Returns the model."""
+    seed, mode, budget, events = read_log(path_to_file)
+    random.seed(seed)
+    model = MODES[mode](**model_options)
+
+    segments = []
+    for event in events:
+        apply(model, event, segments, budget)
+    return model
+
+
+def main():
+    parser = ArgumentParser(prog="python -m chisel.engine.replay",
+                            description="Replay an input log headlessly, as fast as possible.")
+    parser.add_argument("log", type=Path)
+    parser.add_argument("--output", type=Path, help="save the carved boulder as a project")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    model = replay(args.log)
+    elapsed = time.perf_counter() - start
+
+    _, mode, _, events = read_log(args.log)
+    duration = events["time"][-1] if len(events) else 0
+    print(f"Replayed {len(events)} events ({duration:.1f}s of {mode} input) in {elapsed:.3f}s",
+          file=sys.stderr)
+
+    if args.output is not None:
+        model.save(args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import numpy as np
+
+from .layered import LAYER_SHADES
+from .model import ChiselModel
+
+STRATA = len(LAYER_SHADES)  # Strata of stone under every pixel of a fresh boulder.
+
+
+def palettize(image):
+    """
+    Returns the distinct colors of an image and each pixel's index into them, using the smallest
+    unsigned dtype that fits.
+    """
+    packed = np.ascontiguousarray(image).view(np.uint32)  # One rgba pixel per element.
+    colors, index = np.unique(packed, return_inverse=True)
+    index = index.reshape(image.shape[:2]).astype(np.min_scalar_type(len(colors) - 1))
+    return colors.view(np.uint8).reshape(-1, 4), index
+
+
+def strata_palettes(colors):
+    """
+    Returns the visible color of each palette color at every depth: depth 0 is carved through and
+    transparent, depth STRATA is the untouched top stratum.
+    """
+    palettes = np.zeros((STRATA + 1, len(colors), 4), dtype=np.uint8)
+    palettes[1:, :, :-1] = colors[:, :-1] * np.array(LAYER_SHADES)[:, None, None]
+    palettes[1:, :, -1] = colors[:, -1]
+    return palettes
+
+
+class StrataModel(ChiselModel):
+    """
+    A boulder with strata of stone under every pixel.  Each pixel only stores its depth (strata
+    left, a uint8) and the index of its color in a small palette; the visible color of a pixel is
+    `palettes[depth, index]`.  Every poke carves one stratum off the pixels it hits, and tool `i`
+    carves no deeper than `i` strata.
+    """
+
+    mode = "strata"
+    map_projects = False  # Every pixel is read to build the palette anyway.
+
+    def set_boulder(self, image, source=None, brightness=None, state=None):
+        """
+        Replace the boulder; every opaque pixel starts with all strata, unless `state` from a
+        saved project restores the palette and depth of every pixel.  `brightness` isn't used by
+        this model.
+        """
+        self.source = source
+
+        if state is None:
+            self.colors, self.index = palettize(image)
+            self.depth = np.where(image[..., -1] != 0, STRATA, 0).astype(np.uint8)
+        else:
+            self.colors, self.index, self.depth = state["colors"], state["index"], state["depth"]
+        self.palettes = strata_palettes(self.colors)
+        self.image = self.palettes[self.depth, self.index]
+
+        self.dirty = None
+        self.pebbles.clear()
+        self.history.clear()
+
+    def flat_arrays(self):
+        return {"image": self.image.reshape(-1, 4), "depth": self.depth.reshape(-1)}
+
+    def saved_state(self):
+        return {"colors": self.colors.copy(), "index": self.index.copy(),
+                "depth": self.depth.copy()}
+
+    def poke_many(self, points, velocities):
+        """
+        Poke the boulder at every point at once.  A pixel hit by more than one poke is only
+        chiselled once.  Returns number of pebbles created.
+        """
+        points, velocities, pixels, owner = self.brushed(points, velocities)
+
+        depth = self.depth.reshape(-1)
+        eligible = depth[pixels] > self.tool
+        if not eligible.any():
+            return 0
+        pixels, owner = pixels[eligible], owner[eligible]
+
+        flat_image = self.image.reshape(-1, 4)
+        self.release_pebbles(points, velocities, pixels, owner, flat_image[pixels])
+        self.history.record("depth", depth, pixels)
+        self.history.record("image", flat_image, pixels)
+
+        depth[pixels] -= 1
+        flat_image[pixels] = self.palettes[depth[pixels], self.index.reshape(-1)[pixels]]
+        return len(pixels)
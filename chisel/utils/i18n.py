@@ -1,26 +1,52 @@
+from functools import lru_cache
 import gettext
+import hashlib
 import json
 import locale
 from pathlib import Path
 
-from babel.messages.pofile import read_po
-from babel.messages.mofile import write_mo
-
 DEFAULT_LOCALE = "en_US"
 SYSTEM_LOCALE = locale.getdefaultlocale()[0]
-TRANSLATIONS = {}
+LOCALES_PATH = Path("locales")
 
 with open("locales.json", encoding="utf-8") as file:
     LOCALES = json.load(file)
 
-for locale_ in LOCALES:
-    if locale_ == DEFAULT_LOCALE:
-        TRANSLATIONS[locale_] = gettext.NullTranslations()
-        continue
 
-    path = Path("locales") / locale_ / "LC_MESSAGES"
-    with (path / "messages.po").open(encoding="utf-8") as file:
+def compile_catalog(locale_, force=False):
+    """
+    Compile a locale's messages.po to messages.mo, unless the .mo was already compiled from the
+    same .po as recorded by the hash stored next to it.  Babel is only imported to compile.
+    """
+    path = LOCALES_PATH / locale_ / "LC_MESSAGES"
+    po_path, mo_path, hash_path = (path / name
+                                   for name in ("messages.po", "messages.mo", "messages.sha256"))
+
+    digest = hashlib.sha256(po_path.read_bytes()).hexdigest()
+    if not force and mo_path.exists() and hash_path.exists() and hash_path.read_text() == digest:
+        return
+
+    from babel.messages.pofile import read_po
+    from babel.messages.mofile import write_mo
+
+    with po_path.open(encoding="utf-8") as file:
         catalog = read_po(file, ignore_obsolete=True)
-    with (path / "messages.mo").open("wb") as file:
+    with mo_path.open("wb") as file:
         write_mo(file, catalog)
-    TRANSLATIONS[locale_] = gettext.translation("messages", "locales", [locale_])
+    hash_path.write_text(digest)
+
+
+@lru_cache(maxsize=None)
+def get_translation(locale_):
+    """Returns the translations of a locale, compiling its catalog first if needed."""
+    if locale_ == DEFAULT_LOCALE:
+        return gettext.NullTranslations()
+
+    compile_catalog(locale_)
+    return gettext.translation("messages", str(LOCALES_PATH), [locale_])
+
+
+if __name__ == "__main__":  # Build step: python -m chisel.utils.i18n
+    for locale_ in LOCALES:
+        if locale_ != DEFAULT_LOCALE:
+            compile_catalog(locale_, force=True)
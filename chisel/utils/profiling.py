@@ -0,0 +1,29 @@
+from contextlib import contextmanager
+import sys
+import time
+
+
+class StartupProfile:
+    """Records how long each named phase of startup takes."""
+
+    def __init__(self, budget):
+        self.budget = budget  # Seconds until first frame we aim for.
+        self.start = time.perf_counter()
+        self.phases = []
+
+    @contextmanager
+    def measure(self, name):
+        start = time.perf_counter()
+        yield
+        self.phases.append((name, time.perf_counter() - start))
+
+    def report(self, file=sys.stderr):
+        """Print every phase and the time elapsed since the profile was created."""
+        total = time.perf_counter() - self.start
+        width = max(len(name) for name, _ in (*self.phases, ("first frame", 0)))
+
+        print("Startup profile:", file=file)
+        for name, duration in self.phases:
+            print(f"  {name:<{width}}  {duration * 1e3:8.1f} ms", file=file)
+        print(f"  {'first frame':<{width}}  {total * 1e3:8.1f} ms", end="", file=file)
+        print(" (over budget)" if total > self.budget else "", file=file)
@@ -0,0 +1,58 @@
+from functools import lru_cache
+import hashlib
+import os
+from pathlib import Path
+
+IMAGE_PATH = Path("assets", "img")
+SPRITE_FOLDERS = "burger", "caveman", "cursor"
+ATLAS_PATH = IMAGE_PATH / "sprites"  # Generates sprites.atlas, sprites-0.png and sprites.sha256
+ATLAS_SIZE = 512  # Large enough that every sprite fits in a single texture.
+
+
+def sprite_paths():
+    return sorted(path for folder in SPRITE_FOLDERS for path in (IMAGE_PATH / folder).glob("*.png"))
+
+
+def build_atlas(force=False):
+    """
+    Pack every sprite into one atlas image, unless the atlas was already built from the same
+    sprites as recorded by the hash stored next to it.  Kivy's atlas tool needs Pillow, so it's
+    only imported to build.
+    """
+    paths = sprite_paths()
+    atlas_path, hash_path = ATLAS_PATH.with_suffix(".atlas"), ATLAS_PATH.with_suffix(".sha256")
+
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(path.as_posix().encode())
+        digest.update(path.read_bytes())
+    digest = digest.hexdigest()
+    if not force and atlas_path.exists() and hash_path.exists() and hash_path.read_text() == digest:
+        return
+
+    from kivy.atlas import Atlas
+
+    Atlas.create(str(ATLAS_PATH), [str(path) for path in paths], ATLAS_SIZE, use_path=True)
+    hash_path.write_text(digest)
+
+
+@lru_cache(maxsize=None)
+def load_atlas():
+    """Decode the atlas once; every sprite is a region of its texture."""
+    from kivy.atlas import Atlas
+
+    build_atlas()
+    atlas = Atlas(str(ATLAS_PATH.with_suffix(".atlas")))
+    for texture in atlas.original_textures:
+        texture.mag_filter = "nearest"
+    return atlas
+
+
+def sprite(name):
+    """Returns the texture region of a sprite, e.g., `sprite("cursor/up_0")`."""
+    # Atlas ids are the sprite's path with separators replaced by underscores.
+    return load_atlas()[str(IMAGE_PATH / name).replace(os.sep, "_")]
+
+
+if __name__ == "__main__":  # Build step: python -m chisel.utils.sprites
+    build_atlas(force=True)
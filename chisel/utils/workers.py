@@ -0,0 +1,15 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from kivy.clock import Clock
+
+EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="chisel")
+
+
+def submit(function, callback, *args):
+    """
+    Run `function(*args)` on a worker thread.  `callback(future)` is called on the main thread once
+    it's done.
+    """
+    future = EXECUTOR.submit(function, *args)
+    future.add_done_callback(lambda future: Clock.schedule_once(lambda dt: callback(future)))
+    return future
@@ -6,15 +6,16 @@ from kivy.uix.image import Image
 from kivy.core.window import Window
 from kivy.uix.behaviors import ToggleButtonBehavior
 
+from ..utils.sprites import sprite
 from .mixins import SignBorder
 
 IMAGE_PATH = Path("assets", "img")
 BUTTON_NORMAL = str(IMAGE_PATH / "button" / "normal.png")
 BUTTON_HOVER = str(IMAGE_PATH / "button" / "hover.png")
 BUTTON_PRESSED = str(IMAGE_PATH / "button" / "pressed.png")
-BURGER_NORMAL = str(IMAGE_PATH / "burger" / "normal.png")
-BURGER_HOVER = str(IMAGE_PATH / "burger" / "hover.png")
-BURGER_PRESSED = str(IMAGE_PATH / "burger" / "pressed.png")
+BURGER_NORMAL = "burger/normal"
+BURGER_HOVER = "burger/hover"
+BURGER_PRESSED = "burger/pressed"
 
 
 class Button(SignBorder, KivyButton):
@@ -46,7 +47,10 @@ class Button(SignBorder, KivyButton):
 
 class BurgerButton(ButtonBehavior, Image):
     def __init__(self):
-        super().__init__(source=BURGER_NORMAL, size_hint=(None, None))
+        self.normal, self.hover, self.pressed = map(sprite, (BURGER_NORMAL,
+                                                             BURGER_HOVER,
+                                                             BURGER_PRESSED))
+        super().__init__(texture=self.normal, size_hint=(None, None))
 
         Window.bind(mouse_pos=self._on_mouse_pos)
         self.bind(state=self._on_state, pos=self._on_mouse_pos)
@@ -55,37 +59,35 @@ class BurgerButton(ButtonBehavior, Image):
         if self.state == "down" and not override:
             return
         if self.collide_point(*self.to_widget(*Window.mouse_pos)):
-            self.source = BURGER_HOVER
+            self.texture = self.hover
         else:
-            self.source = BURGER_NORMAL
+            self.texture = self.normal
 
     def _on_state(self, *args):
         if self.state == "down":
-            self.source = BURGER_PRESSED
+            self.texture = self.pressed
         else:
             self._on_mouse_pos(override=True)
 
 
 class ToolButton(ToggleButtonBehavior, Image):
-    """Toggle buttons for tool selection."""
+    """Toggle buttons for tool selection.  `normal` and `pressed` are names of sprites."""
     def __init__(self, _id, normal, pressed, chisel, cursor):
         self._id = _id
-        self._normal = normal
-        self._pressed = pressed
+        self._normal = sprite(normal)
+        self._pressed = sprite(pressed)
         self.chisel = chisel
         self.cursor = cursor
 
-        super().__init__(source=normal, size_hint=(.1, .1))
+        super().__init__(texture=self._normal, size_hint=(.1, .1))
 
         self.group = 'tool_button'
         self.allow_no_selection = False
         self.allow_stretch = True
-        self.texture.mag_filter = "nearest"
 
         self.bind(state=self._on_state)
 
     def _on_state(self, *args):
         self.chisel.tool(self._id)
         self.cursor.tool(self._id)
-        self.source = self._pressed if self.state == "down" else self._normal
-        self.texture.mag_filter = "nearest"
+        self.texture = self._pressed if self.state == "down" else self._normal
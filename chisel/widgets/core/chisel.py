@@ -1,261 +1,368 @@
-import io
-from itertools import product
 from pathlib import Path
-from random import choice
+import random
 
 import numpy as np
-from PIL import Image
 
 from kivy.app import App
 from kivy.clock import Clock
-from kivy.core.audio import SoundLoader
+from kivy.core.window import Window
 from kivy.uix.widget import Widget
-from kivy.graphics import Color, Rectangle
+from kivy.graphics import Color, Mesh, PopMatrix, PushMatrix, Rectangle, Scale, Translate
 from kivy.graphics.texture import Texture
 
-GRAVITY = .01
-FRICTION = .9
+from ...engine import MODES, ChiselModel, export_png
+from ...engine.model import IMAGE_SCALE, X_OFFSET, Y_OFFSET, STROKE_BUDGET, preload_boulders
+from ...engine.pebbles import TIMESTEP
+from ...engine.replay import DOWN, FRAME, MOVE, REDO, RESET, UNDO, UP, Recorder, apply, read_log
+from ...utils.workers import EXECUTOR, submit
 
-IMAGE_SCALE = .75
-SCALE_INVERSE = 1 / IMAGE_SCALE
-X_OFFSET = (1 - IMAGE_SCALE) / 2
-Y_OFFSET = .1
-IMAGE_DIM = 100, 100
+MAX_SUBSTEPS = 4
+EXPORT_SCALE = 8  # Exported pngs are this many times the boulder's resolution.
 
-RADIUS = R = 1
-MIN_POWER = 1e-5
-CHISEL_POWER = 1e3
+MAX_PEBBLES = 2**14  # Mesh indices are unsigned shorts and each pebble is 4 vertices.
+PALETTE_DIM = 2**7  # Palette texture is PALETTE_DIM x PALETTE_DIM; one texel per pebble slot.
+QUAD = np.array(((0, 0), (1, 0), (1, 1), (0, 1)))
+QUAD_INDICES = (np.arange(MAX_PEBBLES)[:, None] * 4 + (0, 1, 2, 2, 3, 0)).ravel().tolist()
+PALETTE_UV = (np.indices((PALETTE_DIM, PALETTE_DIM))[::-1].reshape(2, -1).T + .5) / PALETTE_DIM
 
 BACKGROUND = str(Path("assets", "img", "background.png"))
-SOUND = (str(Path("assets", "sounds", f"00{i}.wav")) for i in range(1, 5))
-BOULDER_IMAGE_PATHS = tuple(Path("assets", "img", "boulder", f"{i}.png") for i in range(5))
+SOUND = tuple(str(Path("assets", "sounds", f"00{i}.wav")) for i in range(1, 5))
 
 
-def perceived_brightness(colors):
-    """Returns the perceived brightness of a color."""
-    normal = colors / 255
-    linearized = np.where(normal <= .04045, normal / 12.92, ((normal + .055) / 1.055)**2.4)
-    luminance = linearized @ (.2126, .7152, .0722)
-    brightness = np.where(luminance <= .008856, luminance * 903.3, luminance**(1 / 3) * 116 - 16)
-    return brightness
+def check_capacity(model):
+    """Returns the model; raises ValueError if it can have more pebbles than Chisel can draw."""
+    if model.pebbles.capacity > MAX_PEBBLES:
+        raise ValueError(f"pebble capacity {model.pebbles.capacity} is more than the "
+                         f"{MAX_PEBBLES} pebbles Chisel can draw")
+    return model
 
 
-class Pebble:
-    """
-    Simple gravity physics for pebbles. Deletes itself after pebbles reach the floor.
-    """
-
-    def __init__(self, pixel, chisel, velocity):
-        self.pixel = pixel
-        self.chisel = chisel
-        self.velocity = velocity
-        self.update = Clock.schedule_interval(self.step, 1 / 30)
-
-    def step(self, dt):
-        """Gravity Physics"""
-        pixel = self.pixel
-        x, y = pixel.x, pixel.y
-        vx, vy = self.velocity
-        vx *= FRICTION
-        vy *= FRICTION
-        vy -= GRAVITY
-        # Bounce off walls
-        if not 0 < x < 1:
-            vx *= -1
-
-        self.velocity = vx, vy
-        pixel.update_pos(x + vx, y + vy)
-
-        if pixel.y < 0:
-            self.update.cancel()
-            self.chisel.canvas.remove(pixel)
-            self.chisel.pebbles.remove(self)  # Remove reference // kill this object
-
-
-class Pixel(Rectangle):
-    """
-    Kivy Rectangle with unscaled coordinates (x, y) and color information.
+class Chisel(Widget):
     """
+    Kivy front-end of a ChiselModel: turns touches into pokes and draws the boulder and pebbles.
 
-    def __init__(self, x, y, chisel, color, *args, **kwargs):
-        self.x, self.y = x, y
-        self.chisel = chisel
-        self.color = color = Color(*color)
-        a = color.a
-        color.a = 0  # Initially not visible as size is not correct yet.
-        super().__init__(*args, **kwargs)
-        self.rescale()
-        color.a = a
-
-    def update_pos(self, x, y):
-        self.x, self.y = x, y
-        self.pos = x * self.chisel.width, y * self.chisel.height
+    Pebbles are drawn as quads of a single Mesh.  The default shader has no per-vertex color,
+    so each quad samples its color from its pebble slot's texel of a palette texture.
 
-    def rescale(self):
-        chisel = self.chisel
-        screen_w, screen_h = chisel.width, chisel.height
-        image_h, image_w, _ = chisel.image.shape
-        self.size = (IMAGE_SCALE * screen_w) / image_w, (IMAGE_SCALE * screen_h) / image_h
+    Everything is drawn in touch coordinates, (0, 0) to (1, 1), under a single transform to the
+    widget's position and size, so resizing doesn't touch the boulder or pebbles.
 
+    `model` can be any ChiselModel, e.g. a LayeredModel; a random classic boulder by default.
 
-class Chisel(Widget):
-    """
-    Handles collision detection between boulder and the hammer.  Creates Pebbles on collision.
+    Input can be recorded to a log with `start_recording` and played back in real time with
+    `replay`; see `engine.replay`.
     """
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, model=None, **kwargs):
         super().__init__(*args, **kwargs)
-        self._tool = 0  # 0, 1, or 2
-        self.touched = self.disabled = False
-        self.sounds = tuple(map(SoundLoader.load, SOUND))
-        self.load_boulder()
+        self.disabled = False
+        self.stroke = []  # Touch segments moved since the last frame.
+        self.stroke_budget = STROKE_BUDGET
+        self.stroke_trigger = Clock.create_trigger(self.apply_stroke)
+        self.accumulator = 0  # Frame time not yet simulated.
+        self.simulation = Clock.create_trigger(self.simulate, 0, interval=True)
+        self.sounds = ()
+        # Sounds are picked with their own generator so the seeded `random` only picks boulders.
+        self.sound_random = random.Random()
+        Window.bind(on_flip=self.load_sounds)  # Audio is loaded once the first frame is drawn.
+        self.recorder = None
+        self.replaying = False
+        self.replay_trigger = Clock.create_trigger(self.replay_step, 0, interval=True)
+        self.model = check_capacity(ChiselModel() if model is None else model)
+        EXECUTOR.submit(preload_boulders)  # So resets don't decode images.
+        self.palette = np.zeros((PALETTE_DIM, PALETTE_DIM, 4), dtype=np.uint8)
+        self.upload_trigger = Clock.create_trigger(self.upload_dirty)
+        self.setup_texture()
         self.setup_canvas()
         self.bind(size=self.resize, pos=self.resize)
+        Window.bind(on_key_down=self._on_key_down)
+
+    def load_sounds(self, window):
+        window.unbind(on_flip=self.load_sounds)
+        from kivy.core.audio import SoundLoader
+        self.sounds = tuple(map(SoundLoader.load, SOUND))
 
     def load_boulder(self, path_to_image=None):
-        if path_to_image is None:
-            image = Image.open(choice(BOULDER_IMAGE_PATHS))
-            image.thumbnail(IMAGE_DIM, Image.NEAREST)
-            w, h = image.size
-            image = np.frombuffer(image.tobytes(), dtype=np.uint8)
-            self.image = image.reshape((h, w, 4))[::-1, :, :].copy()
-
-            alpha_channel = self.image[:, :, -1]  # Fix some slightly transparent pixels
-            alpha_channel[alpha_channel > 127] = 255
-        else:
-            self.image = np.load(path_to_image)
-            h, w, _ = self.image.shape
+        self.model.load_boulder(path_to_image)
+        self.setup_texture()
 
+    def setup_texture(self):
+        image = self.model.image
+        h, w, _ = image.shape
+        self.model.take_dirty()
         self.texture = Texture.create(size=(w, h))
         self.texture.mag_filter = "nearest"
-        self.texture.blit_buffer(self.image.tobytes(), colorfmt="rgba", bufferfmt="ubyte")
+        # Kivy only takes one-dimensional buffers; a flat view avoids copying with tobytes().
+        self.texture.blit_buffer(np.ascontiguousarray(image).reshape(-1),
+                                 colorfmt="rgba", bufferfmt="ubyte")
+
+    def upload_dirty(self, *args):
+        """Upload only the region of the image changed since the last upload to the texture."""
+        dirty = self.model.take_dirty()
+        if dirty is None:
+            return
+
+        l, t, r, b = dirty
+        region = np.ascontiguousarray(self.model.image[t:b, l:r])
+        self.texture.blit_buffer(region.reshape(-1), pos=(l, t), size=(r - l, b - t),
+                                 colorfmt="rgba", bufferfmt="ubyte")
+        self.canvas.ask_update()
 
     def setup_canvas(self):
-        self.pebbles = []  # Any falling pebbles will be destroyed.
+        self.simulation.cancel()
+        self.accumulator = 0
+
+        palette_texture = Texture.create(size=(PALETTE_DIM, PALETTE_DIM))
+        palette_texture.mag_filter = palette_texture.min_filter = "nearest"
 
         with self.canvas:
+            PushMatrix()
+            self.translate = Translate()
+            self.scale = Scale()
+
             self.background_color = Color(1, 1, 1, 1)
-            self.background = Rectangle(source=BACKGROUND)
+            self.background = Rectangle(size=(1, 1), source=BACKGROUND)
             self.background.texture.mag_filter = "nearest"
 
             Color(1, 1, 1, 1)
-            self.boulder = Rectangle(texture=self.texture)
-
+            self.boulder = Rectangle(pos=(X_OFFSET, Y_OFFSET),
+                                     size=(IMAGE_SCALE, IMAGE_SCALE),
+                                     texture=self.texture)
+            self.pebble_mesh = Mesh(mode="triangles", texture=palette_texture)
+            PopMatrix()
+
+        self.upload_palette()
+        self.render_pebbles()
         self.resize()
 
     def resize(self, *args):
-        self.background.pos = self.pos
-        self.background.size = self.size
+        self.translate.x, self.translate.y = self.pos
+        self.scale.x, self.scale.y = self.size
 
-        self.boulder.size = IMAGE_SCALE * self.width, IMAGE_SCALE * self.height
-        self.boulder.pos = self.width * X_OFFSET, self.height * Y_OFFSET
+    def upload_palette(self):
+        """Write pebble colors to the palette texture; each pebble slot has its own texel."""
+        colors = self.model.pebbles.colors
+        self.palette.reshape(-1, 4)[:len(colors)] = colors
+        self.pebble_mesh.texture.blit_buffer(self.palette.reshape(-1),
+                                             colorfmt="rgba", bufferfmt="ubyte")
 
-        for pebble in self.pebbles:
-            pebble.pixel.rescale()
+    def render_pebbles(self):
+        """Rebuild the mesh vertices from pebble positions interpolated between the last steps."""
+        slots, positions = self.model.pebbles.interpolated(self.accumulator / TIMESTEP)
+        n = len(slots)
 
-    def tool(self, i):
-        self._tool = i
+        image_h, image_w, _ = self.model.image.shape
+        size = IMAGE_SCALE / image_w, IMAGE_SCALE / image_h
+
+        vertices = np.empty((n, 4, 4), dtype=np.float32)
+        vertices[:, :, :2] = positions[:, None] + QUAD * size
+        vertices[:, :, 2:] = PALETTE_UV[slots, None]
 
-    @staticmethod
-    def poke_power(touch, pixel_x, pixel_y):
+        self.pebble_mesh.vertices = vertices.ravel().tolist()
+        self.pebble_mesh.indices = QUAD_INDICES[:6 * n]
+
+    def simulate(self, dt):
         """
-        Returns the force vector of a poke.
+        Fixed-timestep simulation loop.  Frame time is accumulated and pebbles are stepped once per
+        TIMESTEP, at most MAX_SUBSTEPS times a frame; time past that is dropped.  Pebbles are drawn
+        interpolated between the last two steps.
         """
-        tx, ty = touch.spos
-        dx, dy = pixel_x - tx, pixel_y - ty
-
-        distance = max(.001, dx**2 + dy**2)
-        touch_velocity = touch.dsx**2 + touch.dsy**2
+        pebbles = self.model.pebbles
+        self.accumulator = min(self.accumulator + dt, MAX_SUBSTEPS * TIMESTEP)
+        while self.accumulator >= TIMESTEP:
+            pebbles.step()
+            self.accumulator -= TIMESTEP
 
-        power = max(MIN_POWER, CHISEL_POWER * touch_velocity) / distance
+        self.render_pebbles()
 
-        return power * dx, power * dy
+        if not len(pebbles):
+            self.simulation.cancel()
+            self.accumulator = 0
 
-    def poke(self, touch):
-        tx, ty = touch.spos
-        x, y = SCALE_INVERSE * (tx - X_OFFSET), SCALE_INVERSE * (ty - Y_OFFSET)
-        if not (0 <= x <= 1 and 0 <= y <= 1):
-            return
+    def tool(self, i):
+        self.model.tool = i
 
-        image = self.image
-        h, w, _ = image.shape
-        x, y = int(x * w), int(y * h)  # Image coordinate of pixel in center of poke
-
-        # poke bounds; R is poke radius
-        l, r = max(0, x - R), min(w, x + R + 1)  # left and right bounds
-        t, b = max(0, y - R), min(h, y + R + 1)  # top and bottom bounds
-
-        # Create pebbles around poke and darken area:
-        for x, y in product(range(l, r), range(t, b)):
-            color = image[y, x, :]
-            if not color[-1] or perceived_brightness(color[:-1]) < 20 * self._tool:
-                continue
-
-            px, py = x * IMAGE_SCALE / w + X_OFFSET, y * IMAGE_SCALE / h + Y_OFFSET
-            with self.canvas:
-                pixel = Pixel(px, py, self, color / 255)
-            velocity = self.poke_power(touch, px, py)
-            self.pebbles.append(Pebble(pixel, self, velocity))
-
-            darker = color[:-1] * .8
-            if perceived_brightness(darker) < 15:
-                image[y, x, -1] = 0
-            else:
-                image[y, x, :-1] = darker
+    def _after_poke(self, created):
+        if created:
+            self.upload_palette()
+            self.upload_trigger()
+            self.simulation()
 
-        self.texture.blit_buffer(image.tobytes(), colorfmt="rgba", bufferfmt="ubyte")
-        self.canvas.ask_update()
+    def poke(self, touch):
+        self.record(DOWN, *touch.spos, touch.dsx, touch.dsy)
+        self._after_poke(self.model.poke(*touch.spos, touch.dsx, touch.dsy))
 
     def on_touch_down(self, touch):
-        if self.disabled:
+        if self.disabled or self.replaying:
             return
 
         self.poke(touch)
-        choice(self.sounds).play()
+        if self.sounds:
+            self.sound_random.choice(self.sounds).play()
         return True
 
     def on_touch_move(self, touch):
-        if self.disabled:
+        if self.disabled or self.replaying:
+            return
+
+        segment = touch.psx, touch.psy, touch.sx, touch.sy, touch.dsx, touch.dsy
+        self.record(MOVE, *segment)
+        self.stroke.append(segment)
+        self.stroke_trigger()
+        return True
+
+    def on_touch_up(self, touch):
+        if self.disabled or self.replaying:
             return
 
-        if not self.touched:
-            self.touched = True
-            self.poke(touch)
-            # Limit how quickly touch_move chisels away stone.
-            Clock.schedule_once(self.untouch, 1/60)
+        # A stroke is undone as a whole; segments still waiting for the next frame are part of it.
+        self.stroke_trigger.cancel()
+        self.apply_stroke(0)
+        self.record(UP)
+        self.model.history.commit()
         return True
 
-    def untouch(self, dt):
-        self.touched = False
+    def apply_stroke(self, dt):
+        """Poke along every segment the touch moved since the last frame in one batched pass."""
+        if self.stroke:
+            self.record(FRAME)
+        created = self.model.stroke(self.stroke, self.stroke_budget)
+        self.stroke.clear()
+        self._after_poke(created)
+
+    def undo(self):
+        self.record(UNDO)
+        if self.model.undo():
+            self.upload_trigger()
+
+    def redo(self):
+        self.record(REDO)
+        if self.model.redo():
+            self.upload_trigger()
+
+    def _on_key_down(self, window, key, scancode, codepoint, modifiers):
+        """Ctrl+Z undoes the last stroke; Ctrl+Y or Ctrl+Shift+Z redoes it."""
+        if self.disabled or self.replaying or not {"ctrl", "meta"} & set(modifiers):
+            return
+
+        if key == ord("z") and "shift" not in modifiers:
+            self.undo()
+        elif key == ord("y") or key == ord("z"):
+            self.redo()
+        else:
+            return
+        return True
 
     def reset(self):
+        self.record(RESET)
         self.load_boulder()
         self.canvas.clear()
         self.setup_canvas()
 
-    def save(self, path_to_file):
-        buffer = io.BytesIO()  # Numpy will overwrite the extension unless we save to a buffer.
-        np.save(buffer, self.image, fix_imports=False)
+    def record(self, kind, *values):
+        if self.recorder is not None:
+            self.recorder.record(kind, self.model.tool, *values)
+
+    def start_recording(self, path_to_file, mode):
+        """
+        Record input to a log.  Recording starts on a new boulder picked after seeding `random`, so
+        a replay starts on the same boulder.  `mode` is the name of the model's mode in MODES.
+        """
+        self.stop_recording()
+        recorder = Recorder(path_to_file, mode, budget=self.stroke_budget)
+        self.reset()
+        self.recorder = recorder
+
+    def stop_recording(self):
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+
+    def replay(self, path_to_file):
+        """Replay an input log in real time on a new model of the log's mode, ignoring touches."""
+        self.stop_recording()
+        seed, mode, self.replay_budget, self.replay_events = read_log(path_to_file)
+        random.seed(seed)
+        self.set_model(MODES[mode]())
+
+        self.replay_position = 0  # Index of the next event.
+        self.replay_time = 0
+        self.replay_segments = []
+        self.replaying = True
+        self.replay_trigger()
+
+    def replay_step(self, dt):
+        """Apply every event of the replay that happened by this frame."""
+        self.replay_time += dt
+        events = self.replay_events
+        end = np.searchsorted(events["time"], self.replay_time, side="right")
+
+        created = 0
+        for event in events[self.replay_position:end]:
+            if event["kind"] == RESET:  # The boulder's texture has to be replaced too.
+                self.reset()
+            else:
+                created += apply(self.model, event, self.replay_segments, self.replay_budget)
+        if end > self.replay_position:
+            self.upload_trigger()
+        self._after_poke(created)
+
+        self.replay_position = end
+        if end == len(events):
+            self.replay_trigger.cancel()
+            self.replaying = False
+
+    def save_task(self, path_to_file):
+        """
+        Snapshot the image and model state and return a function that saves them as a project.
+        The function can be run on any thread.
+        """
+        self.model.unmap(path_to_file)
+        image, state = self.model.image.copy(), self.model.saved_state()
+        return lambda: self.model.save(path_to_file, image=image, state=state)
 
-        with open(path_to_file, "wb") as file:
-            file.write(buffer.getvalue())
+    def save(self, path_to_file):
+        self.save_task(path_to_file)()
 
-    def load(self, path_to_file):
-        self.load_boulder(path_to_file)
+    def set_model(self, model):
+        """Carve a different model, e.g. one of another mode."""
+        self.stop_recording()  # The log's mode is the old model's.
+        self.model = check_capacity(model)
+        self.setup_texture()
         self.canvas.clear()
         self.setup_canvas()
 
-    def export_png(self, path_to_file, transparent=False):
-        if transparent:
-            self.background_color.a = 0
-
-        buffer = io.BytesIO()  # Kivy hides filename errors, so we export to buffer first.
-        self.export_as_image().save(buffer, fmt="png")
+    def open_model(self, mode, on_open=None):
+        """
+        Build a model of `mode` with a random boulder on a worker thread, so the boulder isn't
+        decoded on this one, and carve it once it's built; then call `on_open()`.
+        """
+        def _on_built(future):
+            self.set_model(future.result())
+            if on_open is not None:
+                on_open()
+
+        submit(MODES[mode], _on_built)
+
+    def set_boulder(self, image, source=None, brightness=None, state=None):
+        """Replace the boulder with one read by `open_boulder`, e.g. on a worker thread."""
+        self.stop_recording()  # Input logs can only replay random boulders.
+        self.model.set_boulder(image, source, brightness, state)
+        self.setup_texture()
+        self.canvas.clear()
+        self.setup_canvas()
 
-        with open(path_to_file, "wb") as file:
-            file.write(buffer.getvalue())
+    def export_png_task(self, path_to_file, transparent=False):
+        """
+        Snapshot the image and return a function that exports it as a png.  The function can be
+        run on any thread.
+        """
+        self.model.unmap(path_to_file)
+        image = self.model.image.copy()
+        return lambda: export_png(path_to_file, image, EXPORT_SCALE, transparent)
 
-        self.background_color.a = 1
+    def export_png(self, path_to_file, transparent=False):
+        self.export_png_task(path_to_file, transparent)()
 
 
 if __name__ == "__main__":
@@ -1,19 +1,20 @@
-from pathlib import Path
-
 from kivy.core.window import Window
 from kivy.uix.image import Image
 from kivy.uix.widget import Widget
 
-CURSOR_PATH = Path("assets", "img", "cursor")
-UP = tuple(str(CURSOR_PATH / f"up_{i}.png") for i in range(3))
-DOWN = tuple(str(CURSOR_PATH / f"down_{i}.png") for i in range(3))
+from ..utils.sprites import sprite
+
+UP = tuple(f"cursor/up_{i}" for i in range(3))
+DOWN = tuple(f"cursor/down_{i}" for i in range(3))
 
 
 class CursorImage(Image):
     def __init__(self):
         self._tool = 0
-        super().__init__(source=UP[self.tool])
-        self.texture.mag_filter = 'nearest'
+        # Clicks swap between regions of the sprite atlas, so they never load an image.
+        self.up = tuple(map(sprite, UP))
+        self.down = tuple(map(sprite, DOWN))
+        super().__init__(texture=self.up[self.tool])
         self.allow_stretch = True
         self.size = (40, 40)
 
@@ -27,12 +28,10 @@ class CursorImage(Image):
         self.on_touch_down(None)
 
     def on_touch_down(self, touch):
-        self.source = DOWN[self._tool]
-        self.texture.mag_filter = 'nearest'
+        self.texture = self.down[self._tool]
 
     def on_touch_up(self, touch):
-        self.source = UP[self._tool]
-        self.texture.mag_filter = 'nearest'
+        self.texture = self.up[self._tool]
 
 
 class Cursor(Widget):
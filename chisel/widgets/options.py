@@ -9,17 +9,17 @@ from kivy.metrics import dp, sp
 from kivy.uix.image import Image
 from kivy.uix.label import Label
 
-from ..utils.i18n import DEFAULT_LOCALE, SYSTEM_LOCALE, LOCALES, TRANSLATIONS
+from ..utils.i18n import DEFAULT_LOCALE, SYSTEM_LOCALE, LOCALES, get_translation
+from ..utils.sprites import sprite
 from .mixins import RepeatingBackground
 from .buttons import Button
-from .popups import SelectionPopup, ImportPopup, SaveAsPopup, open_loading_popup
 
 
 FONT: contextvars.ContextVar[str] = contextvars.ContextVar("font")
 
 IMAGE_PATH = Path("assets", "img")
 OPTIONS_BACKGROUND = str(IMAGE_PATH / "options_background.png")
-CAVEMAN = tuple(str(IMAGE_PATH / "caveman" / f"{i}.png") for i in range(4))
+CAVEMAN = tuple(f"caveman/{i}" for i in range(4))
 
 GITHUB_URL = "https://github.com/salt-die/Chisel"
 
@@ -34,71 +34,90 @@ class OptionsPanel(RepeatingBackground, BoxLayout):
         self.setup_background(OPTIONS_BACKGROUND)
 
     def build(self, locale=SYSTEM_LOCALE):
-        self.clear_widgets()
-        if locale in LOCALES:
-            TRANSLATIONS[locale].install()
-        else:
-            locale = DEFAULT_LOCALE
-            TRANSLATIONS[DEFAULT_LOCALE].install()
-
-        FONT.set(LOCALES[locale]["font"])
-
-        title = Label(text=_("Options"),
-                      font_name=FONT.get(),
-                      font_size=sp(30),
-                      size_hint=(1, 0.05),
-                      outline_color=(0, 0, 0),
-                      outline_width=2)
-
-        default_button = dict(font_name=FONT.get(),
+        """Create the panel's widgets.  Changing the language later only calls `set_locale`."""
+        self.title = Label(font_name=LOCALES[DEFAULT_LOCALE]["font"],
+                           font_size=sp(30),
+                           size_hint=(1, 0.05),
+                           outline_color=(0, 0, 0),
+                           outline_width=2)
+
+        default_button = dict(font_name=LOCALES[DEFAULT_LOCALE]["font"],
                               font_size=sp(18),
                               size_hint=(1, None),
                               height=dp(44))
 
-        language_btn = Button(_("Select language"), **default_button)
-        language_btn.bind(on_release=self.open_language_popup)
-
-        import_btn = Button(_("Import..."), **default_button)
-        import_btn.bind(on_release=lambda btn: ImportPopup(FONT.get(), self.chisel).open(btn))
+        # Button text and fonts are set in `set_locale`.
+        self.language_btn = Button("", **default_button)
+        self.language_btn.bind(on_release=self.open_language_popup)
 
-        save_as_btn = Button(_("Save as..."), **default_button)
-        save_as_btn.bind(on_release=lambda btn: SaveAsPopup(FONT.get(), self.chisel).open(btn))
+        self.import_btn = Button("", **default_button)
+        self.import_btn.bind(on_release=self.open_import_popup)
 
-        reset_btn = Button(_("Reset"), **default_button)
-        reset_btn.bind(on_release=self.reset_chisel)
+        self.save_as_btn = Button("", **default_button)
+        self.save_as_btn.bind(on_release=self.open_save_as_popup)
 
-        src_btn = Button(_("Source code"), **default_button)
-        src_btn.bind(on_release=lambda btn: webbrowser.open(GITHUB_URL))
+        self.reset_btn = Button("", **default_button)
+        self.reset_btn.bind(on_release=self.reset_chisel)
 
-        # Animation - Normal loading of an animation won't apply desired mag_filter to each
-        # individual texture, so we load each frame and cycle through the textures 'by-hand'.
-        images = []
-        for source in CAVEMAN:
-            image = Image(source=source, size_hint=(1, 1), allow_stretch=True)
-            image.texture.mag_filter = 'nearest'
-            images.append(image)
-        images = cycle(images)
+        self.src_btn = Button("", **default_button)
+        self.src_btn.bind(on_release=lambda btn: webbrowser.open(GITHUB_URL))
 
-        animation = Image(source=CAVEMAN[0],
-                          size_hint=(1, 1),
-                          allow_stretch=True)
-        animation.texture.mag_filter = 'nearest'
+        # Animation - Each frame is a region of the sprite atlas; we cycle through them 'by-hand'.
+        # The animation only runs while the panel is visible, see `on_opacity`.
+        self.frames = cycle(map(sprite, CAVEMAN))
+        self.animation = Image(texture=next(self.frames),
+                               size_hint=(1, 1),
+                               allow_stretch=True)
+        self.animation_event = Clock.create_trigger(self.next_frame, .2, interval=True)
 
-        def next_texture(*args):
-            animation.texture = next(images).texture
-        Clock.schedule_interval(next_texture, .2)
-
-        widgets = [title,
-                   language_btn,
-                   import_btn,
-                   save_as_btn,
-                   reset_btn,
-                   src_btn,
-                   animation]
+        widgets = [self.title,
+                   self.language_btn,
+                   self.import_btn,
+                   self.save_as_btn,
+                   self.reset_btn,
+                   self.src_btn,
+                   self.animation]
 
         for widget in widgets:
             self.add_widget(widget)
 
+        self.set_locale(locale)
+
+    def set_locale(self, locale):
+        if locale not in LOCALES:
+            locale = DEFAULT_LOCALE
+        get_translation(locale).install()
+
+        FONT.set(LOCALES[locale]["font"])
+
+        self.title.text = _("Options")
+        self.language_btn.text = _("Select language")
+        self.import_btn.text = _("Import...")
+        self.save_as_btn.text = _("Save as...")
+        self.reset_btn.text = _("Reset")
+        self.src_btn.text = _("Source code")
+
+        for widget in (self.title,
+                       self.language_btn,
+                       self.import_btn,
+                       self.save_as_btn,
+                       self.reset_btn,
+                       self.src_btn):
+            widget.font_name = FONT.get()
+
+    def next_frame(self, dt):
+        self.animation.texture = next(self.frames)
+
+    def on_opacity(self, instance, opacity):
+        super().on_opacity(instance, opacity)  # Sets the canvas' opacity.
+        if not hasattr(self, "animation_event"):  # Not built yet.
+            return
+
+        if opacity:
+            self.animation_event()  # No-op if already scheduled.
+        else:
+            self.animation_event.cancel()
+
     def update_background(self, *args):
         # Overriden to snap to the right position.
         self.bg_rect.texture.uvsize = self._get_uvsize()
@@ -107,19 +126,24 @@ class OptionsPanel(RepeatingBackground, BoxLayout):
         self.bg_rect.pos = self.right - bg_width, self.y
         self.bg_rect.size = bg_width, bg_height
 
+    # Popups (and the file chooser they use) are imported when first opened to speed up startup.
+    def open_import_popup(self, btn):
+        from .popups import ImportPopup
+        ImportPopup(FONT.get(), self.chisel).open(btn)
+
+    def open_save_as_popup(self, btn):
+        from .popups import SaveAsPopup
+        SaveAsPopup(FONT.get(), self.chisel).open(btn)
+
     def open_language_popup(self, *args):
+        from .popups import SelectionPopup
         locales = {code: info["name"] for code, info in LOCALES.items()}
         popup = SelectionPopup(_("Select language"), FONT.get(), locales)
-        popup.bind(choice=lambda instance, choice: self.build(choice))
+        popup.bind(choice=lambda instance, choice: self.set_locale(choice))
         popup.open()
 
     def reset_chisel(self, *args):
-        popup = open_loading_popup(_("Resetting the canvas..."), FONT.get())
-
-        def reset(dt):
-            self.chisel.reset()
-            popup.dismiss()
-        Clock.schedule_once(reset, 0.1)
+        self.chisel.reset()
 
     def bind_to_burger(self, burger):
         def _reposition(*args):
@@ -1,15 +1,17 @@
 from pathlib import Path
 
 from kivy.uix.boxlayout import BoxLayout
-from kivy.clock import Clock
 from kivy.metrics import dp, sp
 from kivy.uix.filechooser import FileChooserListView
 from kivy.uix.button import Button as KivyButton
 from kivy.uix.popup import Popup as KivyPopup
 from kivy.uix.label import Label
+from kivy.uix.progressbar import ProgressBar
 from kivy.properties import StringProperty
 from kivy.uix.textinput import TextInput
 
+from ..engine import open_boulder
+from ..utils.workers import submit
 from .mixins import SignBorder
 from .buttons import Button
 
@@ -77,8 +79,22 @@ def open_error_popup(text, font_name):
     return popup
 
 
-def open_loading_popup(text, font_name):
-    popup = InfoPopup(_("Loading..."), text, font_name, dismissable=False, size_hint=(0.6, 0.3))
+class ProgressPopup(InfoPopup):
+    """Loading popup with a progress bar that dismisses itself once `total` steps are done."""
+
+    def __init__(self, title, text, font_name, total):
+        super().__init__(title, text, font_name, dismissable=False, size_hint=(0.6, 0.35))
+        self.progress_bar = ProgressBar(max=total, size_hint=(1, 0.3))
+        self.content.add_widget(self.progress_bar)
+
+    def advance(self):
+        self.progress_bar.value += 1
+        if self.progress_bar.value >= self.progress_bar.max:
+            self.dismiss()
+
+
+def open_progress_popup(title, text, font_name, total):
+    popup = ProgressPopup(title, text, font_name, total)
     popup.open()
     return popup
 
@@ -153,18 +169,42 @@ class ImportPopup(Popup):
 
     def _select_file(self, *args):
         selection = self.file_chooser.selection
-        if selection:
-            self.dismiss()
-            self.loading_popup = open_loading_popup(_("Importing the project."), self.font_name)
-            Clock.schedule_once(lambda dt: self._load_file(selection[0]), 0.1)
+        if not selection:
+            return
+        self.dismiss()
+
+        # The project is read in full, not mapped, on a worker thread; only the texture upload
+        # happens on this one.
+        # Cancelling the loading popup discards the project once it's read.
+        self.cancelled = self.loaded = False
+        future = submit(open_boulder, self._on_file_loaded, selection[0], True,
+                        self.chisel.model.mode)
+
+        def _cancel(*args):
+            if not self.loaded:
+                self.cancelled = True
+                future.cancel()
+
+        self.loading_popup = InfoPopup(_("Loading..."),
+                                       _("Importing the project."),
+                                       self.font_name,
+                                       size_hint=(0.6, 0.4))
+        self.loading_popup.bind(on_dismiss=_cancel)
+        self.loading_popup.open()
+
+    def _on_file_loaded(self, future):
+        if self.cancelled:
+            return
+        self.loaded = True
+        self.loading_popup.dismiss()
 
-    def _load_file(self, path):
-        try:
-            self.chisel.load(path)
-        except (ValueError, KeyError):
+        error = future.exception()
+        if error is None:
+            self.chisel.set_boulder(*future.result())
+        elif isinstance(error, (ValueError, KeyError, OSError)):
             open_error_popup(_("The file could not be loaded."), self.font_name)
-        finally:
-            self.loading_popup.dismiss()
+        else:
+            raise error
 
     def on_dismiss(self, *args):
         self.file_chooser.cancel()
@@ -275,15 +315,34 @@ class SaveAsPopup(Popup):
     def _save_file(self, *args):
         if self.save_type is None:
             return
-        try:
-            self._do_saves()
-        except OSError:
-            open_error_popup(_("The file could not be saved due to an error "
-                               "raised by the operating system.\nCommon "
-                               "issue: Illegal characters in the file name."),
-                             self.font_name)
         self.dismiss()
 
+        tasks = self._get_save_tasks()
+        progress_popup = open_progress_popup(_("Saving..."),
+                                             _("Saving the file."),
+                                             self.font_name,
+                                             len(tasks))
+        errors = []
+
+        def _on_done(future):
+            error = future.exception()
+            if error is not None:
+                if not isinstance(error, OSError):
+                    raise error
+                if not errors:
+                    self._open_save_error_popup()
+                errors.append(error)
+            progress_popup.advance()
+
+        for task in tasks:
+            submit(task, _on_done)
+
+    def _open_save_error_popup(self):
+        open_error_popup(_("The file could not be saved due to an error "
+                           "raised by the operating system.\nCommon "
+                           "issue: Illegal characters in the file name."),
+                         self.font_name)
+
     def open_save_type_popup(self, *args):
         popup = SelectionPopup(_("Select file type"), self.font_name, self.choices)
         popup.bind(choice=self._set_save_type)
@@ -309,7 +368,11 @@ class SaveAsPopup(Popup):
                       "all": None}
         return extensions[self.save_type]
 
-    def _do_saves(self):
+    def _get_save_tasks(self):
+        """
+        Snapshot the chisel for the selected file types.  Returns functions that write each file
+        and can run on worker threads.
+        """
         filename = self.get_resolved_filename()
         path = Path(self.file_chooser.path)
         ext = self._get_file_extension()
@@ -320,25 +383,23 @@ class SaveAsPopup(Popup):
         else:
             bg_path = trans_path = project_path = path / filename
 
-        def bg_func():
-            self.chisel.export_png(bg_path, transparent=False)
+        def bg_tasks():
+            return [self.chisel.export_png_task(bg_path, transparent=False)]
 
-        def trans_func():
-            self.chisel.export_png(trans_path, transparent=True)
+        def trans_tasks():
+            return [self.chisel.export_png_task(trans_path, transparent=True)]
 
-        def project_func():
-            self.chisel.save(project_path)
+        def project_tasks():
+            return [self.chisel.save_task(project_path)]
 
-        def all_func():
-            bg_func()
-            trans_func()
-            project_func()
+        def all_tasks():
+            return bg_tasks() + trans_tasks() + project_tasks()
 
-        functions = {"background": bg_func,
-                     "transparent": trans_func,
-                     "project": project_func,
-                     "all": all_func}
-        functions[self.save_type]()
+        functions = {"background": bg_tasks,
+                     "transparent": trans_tasks,
+                     "project": project_tasks,
+                     "all": all_tasks}
+        return functions[self.save_type]()
 
     def on_dismiss(self, *args):
         self.file_chooser.cancel()
@@ -0,0 +1,15 @@
+import os
+
+# Widgets are built without a window: there's no window provider, OpenGL calls go to Kivy's mock
+# backend and metrics that would be read from the window are fixed.
+os.environ.setdefault("KIVY_WINDOW", "")
+os.environ.setdefault("KIVY_GL_BACKEND", "mock")
+os.environ.setdefault("KIVY_NO_ARGS", "1")
+os.environ.setdefault("KIVY_DPI", "96")
+os.environ.setdefault("KIVY_METRICS_DENSITY", "1")
+os.environ.setdefault("KIVY_METRICS_FONTSCALE", "1")
+
+from kivy.graphics.cgl import cgl_init  # noqa: E402
+from kivy.tests.fixtures import kivy_clock  # noqa: E402, F401
+
+cgl_init()  # A window would do this when it's created.
@@ -0,0 +1,59 @@
+from itertools import cycle, islice
+from pathlib import Path
+
+import pytest
+from kivy.base import EventLoop
+from kivy.event import EventDispatcher
+from kivy.properties import ListProperty
+
+from chisel.utils.i18n import LOCALES
+from chisel.widgets import buttons
+from chisel.widgets.options import OptionsPanel
+
+SWITCHES = 10
+# Labels are rendered when the clock ticks, so only locales whose font is in the tree are used.
+RENDERABLE_LOCALES = [code for code, info in LOCALES.items() if Path(info["font"]).exists()]
+
+
+class StandInWindow(EventDispatcher):
+    """Widgets only need a window to exist; buttons also follow its mouse position."""
+    mouse_pos = ListProperty([0, 0])
+
+
+@pytest.fixture()
+def panel(kivy_clock, monkeypatch):
+    window = StandInWindow()
+    monkeypatch.setattr(EventLoop, "window", window)
+    monkeypatch.setattr(buttons, "Window", window)
+    panel = OptionsPanel(None)
+    panel.build()
+    return panel
+
+
+def animation_events(clock, panel):
+    return [event for event in clock.get_events() if event.get_callback() == panel.next_frame]
+
+
+def test_set_locale_keeps_one_animation_event(kivy_clock, panel):
+    panel.opacity = 1  # The caveman is only animated while the panel is visible.
+    kivy_clock.tick()
+    assert panel.canvas.opacity == 1
+    widgets = len(list(panel.walk()))
+
+    for locale in islice(cycle(RENDERABLE_LOCALES), SWITCHES):
+        panel.set_locale(locale)
+        kivy_clock.tick()
+
+    assert len(animation_events(kivy_clock, panel)) == 1
+    assert len(list(panel.walk())) == widgets
+
+
+def test_hiding_panel_cancels_animation(kivy_clock, panel):
+    for _ in range(SWITCHES):
+        panel.opacity = 1
+        kivy_clock.tick()
+        assert panel.canvas.opacity == 1
+        panel.opacity = 0
+        kivy_clock.tick()
+
+    assert not animation_events(kivy_clock, panel)